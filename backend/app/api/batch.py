@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Request
+from app.schemas.batch import BatchItem, BatchRequest, BatchResponse, BatchResult
+import asyncio
+import json
+import os
+
+router = APIRouter(prefix='/batch', tags=['batch'])
+
+# Sub-requests in flight at once. Each holds its own pooled session while it runs (neither a
+# Session nor one DB connection can serve concurrent queries), so this bounds how many
+# connections a single batch takes from the pool.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# Response headers worth passing back per item (validators for the client's own cache)
+_FORWARDED_HEADERS = ("cache-control", "etag", "last-modified")
+
+
+async def _dispatch(app, parent_scope, item: BatchItem) -> BatchResult:
+    """Run one GET through the app in-process, middleware and routing included."""
+    if item.method.upper() != "GET":
+        return BatchResult(status=405, body={"detail": "Only GET requests can be batched"})
+    path, _, query = item.path.partition("?")
+    if not path.startswith("/") or path == "/batch" or path.startswith("/batch/"):
+        return BatchResult(status=400, body={"detail": f"Invalid path: {item.path}"})
+
+    scope = {
+        "type": "http",
+        "asgi": parent_scope.get("asgi", {"version": "3.0"}),
+        "http_version": parent_scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": parent_scope.get("scheme", "https"),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": parent_scope.get("root_path", ""),
+        "query_string": query.encode(),
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in item.headers.items()],
+        "client": parent_scope.get("client"),
+        "server": parent_scope.get("server"),
+        "extensions": {},
+    }
+    if "state" in parent_scope:
+        scope["state"] = parent_scope["state"]
+
+    done = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    status = 500
+    headers = {}
+    body = bytearray()
+
+    async def send(message):
+        nonlocal status, headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        done.set()
+
+    parsed = None
+    if body:
+        if headers.get("content-type", "").startswith("application/json"):
+            parsed = json.loads(body)
+        else:
+            parsed = body.decode("utf-8", errors="replace")
+    return BatchResult(
+        status=status,
+        headers={k: headers[k] for k in _FORWARDED_HEADERS if k in headers},
+        body=parsed,
+    )
+
+
+# POST /batch - run several GET requests in one round trip
+@router.post('', response_model=BatchResponse)
+async def run_batch(payload: BatchRequest, request: Request) -> BatchResponse:
+    """
+    The sub-requests are independent reads, so they run concurrently; each gets its own
+    status, validators and body, and one failing does not fail the others.
+    """
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def _run(item: BatchItem) -> BatchResult:
+        async with semaphore:
+            try:
+                return await _dispatch(request.app, request.scope, item)
+            except Exception as e:
+                return BatchResult(status=500, body={"detail": f"Error running sub-request: {str(e)}"})
+
+    results = await asyncio.gather(*(_run(item) for item in payload.requests))
+    return BatchResponse(responses=list(results))
@@ -1,21 +1,36 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
-from app.schemas.cafes import CafeBase, CafePublic, CafeUpdate
-from app.db.deps import get_db
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends, Query, Response
+from app.schemas.cafes import CafeBase, CafePublic, CafeUpdate, ImageVariants
+from app.schemas.cafe_detail import CafeFull, OccupancyPoint, CAFE_FULL_SECTIONS
+from app.schemas.checkins import CheckinStatus
+from app.schemas.liveUpdate import LiveUpdatePublic
+from app.schemas.reviews import ReviewPublic
+from app.db.deps import get_db, get_async_db, get_read_db, run_with_async_read_session
 from app.db.model import Cafe, LiveUpdates
+from app.db import queries
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from uuid import UUID
-from datetime import datetime, timezone
-from app.services.upload import save_to_s3
+from datetime import datetime, timezone, timedelta, date, time
+from dataclasses import replace
+from app.services.upload import stream_to_s3, UploadTooLarge, UnsupportedMediaType
+from app.services.images import generate_and_store_variants, attach_cafe_variants, load_variants_async
+from app.services import cafe_cache
+from app.core.http_cache import cache_policy, PRIVATE, PUBLIC_LIVE
+from app.db.query_stats import query_budget
+from app.core.logger import app_logger as logger
 from typing import List, Optional
+import asyncio
 import json
+import os
 
 cafes_router = APIRouter(prefix='/cafes', tags=['cafes'])
 
 
 # GET /cafes
 @cafes_router.get('/', response_model=List[CafePublic])
-def get_all_cafes(db: Session = Depends(get_db)) -> List[CafePublic]:
+@cache_policy(PUBLIC_LIVE)
+def get_all_cafes(db: Session = Depends(get_read_db)) -> List[CafePublic]:
     cafes = db.query(Cafe).all()
     
     # Fetch active stories
@@ -42,22 +57,24 @@ def get_all_cafes(db: Session = Depends(get_db)) -> List[CafePublic]:
         else:
             setattr(cafe, 'has_active_stories', False)
             setattr(cafe, 'active_stories', [])
-            
+
+    attach_cafe_variants(db, cafes)
     return cafes
 
 
 # GET /cafes/owner/{cognito_sub}
 @cafes_router.get('/owner/{cognito_sub}', response_model=CafePublic)
-def get_cafe_by_owner(cognito_sub: str, db: Session = Depends(get_db)) -> CafePublic:
-    print(f"DEBUG: fetching cafe for owner: {cognito_sub}")
+@cache_policy(PRIVATE)
+def get_cafe_by_owner(cognito_sub: str) -> CafePublic:
+    logger.debug(f"Fetching cafe for owner {cognito_sub}")
     try:
-        cafe = db.query(Cafe).filter(Cafe.cognito_sub == cognito_sub).first()
+        cafe = cafe_cache.get_owner_detail(cognito_sub)
         if cafe:
-            print(f"DEBUG: Found cafe {getattr(cafe, 'id', 'unknown')} for owner {cognito_sub}")
+            logger.debug(f"Found cafe {cafe['id']} for owner {cognito_sub}")
         else:
-            print(f"DEBUG: No cafe found for owner {cognito_sub}")
+            logger.debug(f"No cafe found for owner {cognito_sub}")
     except Exception as e:
-        print(f"DEBUG: Exception fetching cafe: {str(e)}")
+        logger.exception(f"Error fetching cafe for owner {cognito_sub}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error fetching cafe: {str(e)}")
     if not cafe:
         raise HTTPException(status_code=404, detail="Cafe not found for this owner")
@@ -66,9 +83,12 @@ def get_cafe_by_owner(cognito_sub: str, db: Session = Depends(get_db)) -> CafePu
 
 # GET /cafes/{cafe_id}
 @cafes_router.get('/{cafe_id}', response_model=CafePublic)
-async def get_cafe(cafe_id: UUID, db: Session = Depends(get_db)) -> CafePublic:
+@cache_policy(PUBLIC_LIVE)
+@query_budget(3)
+async def get_cafe(cafe_id: UUID) -> CafePublic:
+    # Detail screens poll this every 30s; writes to the cafe invalidate the entry
     try:
-        cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+        cafe = await cafe_cache.get_detail(cafe_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching cafe: {str(e)}")
     if not cafe:
@@ -76,13 +96,123 @@ async def get_cafe(cafe_id: UUID, db: Session = Depends(get_db)) -> CafePublic:
     return cafe
 
 
+# The detail screen is public unless it asks for the caller's check-in status. No
+# Last-Modified: updated_at spans the story/review lists, which can also shrink
+CAFE_FULL_POLICY = replace(PUBLIC_LIVE, private_params=("user_sub",), last_modified=())
+
+
+async def _full_stories(db, cafe_id: UUID) -> List[LiveUpdatePublic]:
+    stories = (await db.execute(
+        queries.active_stories_for_cafe(cafe_id, datetime.now(timezone.utc))
+    )).scalars().all()
+    variants = await load_variants_async(db, [story.image_url for story in stories])
+    for story in stories:
+        setattr(story, 'variants', variants.get(story.image_url))
+    return [LiveUpdatePublic.model_validate(story) for story in stories]
+
+
+async def _full_reviews(db, cafe_id: UUID, limit: int) -> List[ReviewPublic]:
+    reviews = []
+    for review, username in (await db.execute(queries.latest_reviews_with_usernames(cafe_id, limit))).all():
+        setattr(review, 'username', username or "Unknown")
+        reviews.append(ReviewPublic.model_validate(review))
+    return reviews
+
+
+async def _full_occupancy(db, cafe_id: UUID, points: int) -> List[OccupancyPoint]:
+    # Averaged in the database: 24h of snapshots can be thousands of rows
+    bucket_seconds = max(60, 24 * 3600 // points)
+    since = datetime.now(timezone.utc) - timedelta(hours=24)
+    rows = (await db.execute(queries.occupancy_series_since(cafe_id, since, bucket_seconds))).all()
+    return [
+        OccupancyPoint(at=datetime.fromtimestamp(int(bucket), timezone.utc), occupancy_level=round(level))
+        for bucket, level in rows
+    ]
+
+
+async def _full_checkin(db, cafe_id: UUID, user_sub: str) -> CheckinStatus:
+    start_of_day = datetime.combine(date.today(), time.min)
+    checkin = (await db.execute(queries.latest_checkin_since(user_sub, cafe_id, start_of_day))).scalars().first()
+    return CheckinStatus(checked_in_today=checkin is not None, last_checkin=checkin.created_at if checkin else None)
+
+
+def _newest(*timestamps: Optional[datetime]) -> Optional[datetime]:
+    aware = [ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc) for ts in timestamps if ts is not None]
+    return max(aware, default=None)
+
+
+# GET /cafes/{cafe_id}/full?fields=&user_sub= - everything the cafe detail screen shows
+@cafes_router.get('/{cafe_id}/full', response_model=CafeFull, response_model_exclude_none=True)
+@cache_policy(CAFE_FULL_POLICY)
+@query_budget(8)
+async def get_cafe_full(
+    cafe_id: UUID,
+    fields: Optional[str] = Query(None, description="Comma-separated sections: " + ",".join(CAFE_FULL_SECTIONS)),
+    user_sub: Optional[str] = None,
+    reviews_limit: int = Query(20, ge=1, le=100),
+    occupancy_points: int = Query(48, ge=1, le=288),
+) -> CafeFull:
+    """
+    Read model for the cafe detail screen: the sections are loaded concurrently, each on
+    its own session, and only the requested ones are queried. The ETag (added by the
+    HTTP cache middleware) covers the whole body, so it changes when any section does.
+    """
+    sections = set(CAFE_FULL_SECTIONS) if not fields else {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = sections - set(CAFE_FULL_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # The cafe is always loaded (from the detail cache) so a missing cafe is a 404
+    loads = {"cafe": cafe_cache.get_detail(cafe_id)}
+    if "stories" in sections:
+        loads["stories"] = run_with_async_read_session(_full_stories, cafe_id)
+    if "reviews" in sections:
+        loads["reviews"] = run_with_async_read_session(_full_reviews, cafe_id, reviews_limit)
+    if "occupancy" in sections:
+        loads["occupancy"] = run_with_async_read_session(_full_occupancy, cafe_id, occupancy_points)
+    if "checkin" in sections and user_sub:
+        loads["checkin"] = run_with_async_read_session(_full_checkin, cafe_id, user_sub)
+
+    try:
+        results = dict(zip(loads, await asyncio.gather(*loads.values())))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching cafe: {str(e)}")
+    if not results["cafe"]:
+        raise HTTPException(status_code=404, detail="Cafe not found")
+
+    cafe = CafePublic.model_validate(results["cafe"])
+    stories = results.get("stories")
+    if stories is not None:
+        cafe.has_active_stories = bool(stories)
+    reviews = results.get("reviews")
+    occupancy = results.get("occupancy")
+    checkin = results.get("checkin")
+
+    full = CafeFull(
+        updated_at=_newest(
+            cafe.updated_at,
+            *(story.created_at for story in stories or []),
+            *(review.updated_at or review.created_at for review in reviews or []),
+            occupancy[-1].at if occupancy else None,
+            checkin.last_checkin if checkin else None,
+        ),
+        cafe=cafe if "cafe" in sections else None,
+        stories=stories,
+        reviews=reviews,
+        occupancy=occupancy,
+        checkin=checkin,
+    )
+    # Serialized once here; returning the model would have FastAPI validate it all again
+    return Response(content=full.model_dump_json(exclude_none=True), media_type="application/json")
+
+
 # POST /cafes
 @cafes_router.post('/', response_model=CafePublic, status_code=201)
-async def create_cafe(
+def create_cafe(
     cafe_data: CafeBase,
     db: Session = Depends(get_db)
 ) -> CafePublic:
-    print(f"DEBUG: creating cafe: name={cafe_data.name}, owner={cafe_data.cognito_sub}")
+    logger.debug(f"Creating cafe: name={cafe_data.name}, owner={cafe_data.cognito_sub}")
     try:
         # Create cafe object using the data from JSON
         cafe = Cafe(
@@ -112,13 +242,13 @@ async def create_cafe(
         db.add(cafe)
         db.commit()
         db.refresh(cafe)
-        print(f"DEBUG: Successfully created cafe {cafe.id} for owner {cafe_data.cognito_sub}")
+        cafe_cache.invalidate_cafe(cafe.id, cafe.cognito_sub)
+        logger.info(f"Created cafe {cafe.id} for owner {cafe_data.cognito_sub}")
         return cafe
 
     except Exception as e:
         db.rollback()
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error creating cafe: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating cafe: {str(e)}")
 
 
@@ -127,41 +257,57 @@ async def create_cafe(
 async def upload_cafe_photo(
     file: UploadFile = File(...),
     category: str = "cafe_user_uploads",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    upload = None
     try:
-        content = await file.read()
-        url = save_to_s3(content, file.filename, category)
-        return {"url": url}
+        upload = await stream_to_s3(file, category, keep_local_copy=True, db=db)
+        variants = await generate_and_store_variants(db, upload.url, upload.local_path)
+        return {
+            "url": upload.url,
+            "variants": ImageVariants.model_validate(variants).model_dump() if variants else None
+        }
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
+    finally:
+        if upload and upload.local_path:
+            os.unlink(upload.local_path)
 
 
 # GET /cafes/nearby?lat=&lng=&radius_km=
 @cafes_router.get('/nearby', response_model=List[CafePublic])
-def get_nearby_cafes(lat: float, lng: float, radius_km: float = 10, db: Session = Depends(get_db)) -> List[CafePublic]:
+@cache_policy(PUBLIC_LIVE)
+def get_nearby_cafes(lat: float, lng: float, radius_km: float = 10, db: Session = Depends(get_read_db)) -> List[CafePublic]:
     cafes = db.query(Cafe).filter(
         Cafe.latitude >= lat - (radius_km / 111), 
         Cafe.latitude <= lat + (radius_km / 111), 
         Cafe.longitude >= lng - (radius_km / 111), 
         Cafe.longitude <= lng + (radius_km / 111)
     ).all()
+    attach_cafe_variants(db, cafes)
     return cafes
 
 
 # GET /cafes/search?name=
 @cafes_router.get('/search', response_model=List[CafePublic])
-def search_cafes(name: str, db: Session = Depends(get_db)) -> List[CafePublic]:
+@cache_policy(PUBLIC_LIVE)
+def search_cafes(name: str, db: Session = Depends(get_read_db)) -> List[CafePublic]:
     cafes = db.query(Cafe).filter(Cafe.name.ilike(f"%{name}%")).all()
+    attach_cafe_variants(db, cafes)
     return cafes
 
 
 # PATCH /cafes/{cafe_id}
 @cafes_router.patch('/{cafe_id}', response_model=CafePublic)
 def update_cafe(cafe_id: UUID, cafe_update: CafeUpdate, db: Session = Depends(get_db)) -> CafePublic:
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = db.execute(queries.cafe_by_id(cafe_id)).scalars().first()
     if not cafe:
         raise HTTPException(status_code=404, detail="Cafe not found")
+    previous_owner = cafe.cognito_sub
 
     update_data = cafe_update.dict(exclude_unset=True)
     for key, value in update_data.items():
@@ -187,7 +333,7 @@ def update_cafe(cafe_id: UUID, cafe_update: CafeUpdate, db: Session = Depends(ge
                     else:
                         setattr(cafe, 'occupancy_level', 0)
                 except Exception as e:
-                    print(f"DEBUG: Error calculating occupancy (List): {e}")
+                    logger.warning(f"Error calculating occupancy for cafe {cafe_id} (List): {e}")
             
             # Handle Dict (Summary View - Default Config)
             elif isinstance(value, dict):
@@ -214,7 +360,7 @@ def update_cafe(cafe_id: UUID, cafe_update: CafeUpdate, db: Session = Depends(ge
                     else:
                         setattr(cafe, 'occupancy_level', 0)
                 except Exception as e:
-                    print(f"DEBUG: Error calculating occupancy (Dict): {e}")
+                    logger.warning(f"Error calculating occupancy for cafe {cafe_id} (Dict): {e}")
 
         elif key == 'working_hours' and value is not None:
              # value is already a dict of dicts
@@ -223,20 +369,25 @@ def update_cafe(cafe_id: UUID, cafe_update: CafeUpdate, db: Session = Depends(ge
             setattr(cafe, key, value)
 
     db.commit()
+    cafe_cache.invalidate_cafe(cafe_id, previous_owner, cafe.cognito_sub)
     db.refresh(cafe)
-    return cafe
+    attach_cafe_variants(db, [cafe])
+    # Refill with the row we just wrote so the next poll is a hit
+    return cafe_cache.store_detail(cafe)
 
 
 # DELETE /cafes/{cafe_id}
 @cafes_router.delete('/{cafe_id}', status_code=200)
 def delete_cafe(cafe_id: UUID, db: Session = Depends(get_db)):
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
+    cafe = db.execute(queries.cafe_by_id(cafe_id)).scalars().first()
     if not cafe:
         raise HTTPException(status_code=404, detail="Cafe not found")
     
     try:
+        owner = cafe.cognito_sub
         db.delete(cafe)
         db.commit()
+        cafe_cache.invalidate_cafe(cafe_id, owner)
         return {"message": "Cafe and all associated data deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -2,8 +2,11 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.db.deps import get_db
-from app.db.model import Checkin, User, Cafe
+from app.db.model import Checkin
+from app.db import queries
 from app.schemas.checkins import CheckinCreate, CheckinPublic, CheckinStatus
+from app.core.http_cache import cache_policy, PRIVATE
+from app.db.query_stats import query_budget
 from typing import List
 from datetime import datetime, time, date
 from uuid import UUID
@@ -13,12 +16,12 @@ router = APIRouter(prefix='/checkins', tags=['checkins'])
 @router.post('/', response_model=CheckinPublic, status_code=201)
 def create_checkin(payload: CheckinCreate, db: Session = Depends(get_db)):
     # Verify user exists
-    user = db.query(User).filter(User.cognito_sub == payload.user_sub).first()
+    user = db.execute(queries.user_by_sub(payload.user_sub)).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Verify cafe exists
-    cafe = db.query(Cafe).filter(Cafe.id == payload.cafe_id).first()
+    cafe = db.execute(queries.cafe_by_id(payload.cafe_id)).scalars().first()
     if not cafe:
         raise HTTPException(status_code=404, detail="Cafe not found")
 
@@ -39,6 +42,8 @@ def create_checkin(payload: CheckinCreate, db: Session = Depends(get_db)):
     return new_checkin
 
 @router.get('/status', response_model=CheckinStatus)
+@cache_policy(PRIVATE)
+@query_budget(1)
 def get_checkin_status(
     user_sub: str, 
     cafe_id: UUID, 
@@ -49,11 +54,7 @@ def get_checkin_status(
     start_of_day = datetime.combine(today, time.min)
     
     # Find check-ins for this user and cafe today
-    checkin = db.query(Checkin).filter(
-        Checkin.user_sub == user_sub,
-        Checkin.cafe_id == cafe_id,
-        Checkin.created_at >= start_of_day
-    ).order_by(Checkin.created_at.desc()).first()
+    checkin = db.execute(queries.latest_checkin_since(user_sub, cafe_id, start_of_day)).scalars().first()
     
     return {
         "checked_in_today": checkin is not None,
@@ -61,15 +62,10 @@ def get_checkin_status(
     }
 
 @router.get('/today', response_model=List[UUID])
+@cache_policy(PRIVATE)
 def get_today_checkins(user_sub: str, db: Session = Depends(get_db)):
     # Useful for initializing frontend state: list of cafe IDs checked in today
     today = date.today()
     start_of_day = datetime.combine(today, time.min)
     
-    checkins = db.query(Checkin.cafe_id).filter(
-        Checkin.user_sub == user_sub,
-        Checkin.created_at >= start_of_day
-    ).all()
-    
-    # Extract IDs from result tuples
-    return [c[0] for c in checkins]
+    return db.execute(queries.checkin_cafe_ids_since(user_sub, start_of_day)).scalars().all()
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Depends, Query
 from typing import Optional
-from app.schemas.liveUpdate import LiveUpdateCreate, LiveUpdatePublic
-from app.db.deps import get_db
+from app.schemas.liveUpdate import LiveUpdateCreate, LiveUpdatePublic, LiveUpdateUserResponse, StoryFeedPage
+from app.db.deps import get_db, get_read_db, get_async_db, get_async_read_db
 from app.db.model import LiveUpdates, User, Cafe
+from app.db import queries
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_
+from datetime import datetime, timezone
+import base64
+import math
 from uuid import UUID
-from app.services.upload import save_to_s3
+import os
+from app.services.upload import stream_to_s3, UploadTooLarge, UnsupportedMediaType
+from app.services.images import generate_and_store_variants, load_variants, load_variants_async
+from app.core.http_cache import cache_policy, PRIVATE, PUBLIC_LIVE
+from app.db.query_stats import query_budget
+from app.core.logger import app_logger as logger
 
 liveUpdates_router = APIRouter(prefix='/liveUpdates', tags=['liveUpdates'])
 
@@ -52,13 +63,14 @@ async def create_live_update(
     photo: UploadFile = File(...),
     vibe: Optional[str] = Form(None),
     visit_purpose: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> LiveUpdatePublic:
     """
     Create a new live update by uploading a photo.
     The photo is stored in S3 and the URL is saved in the database.
     Live updates expire after 24 hours.
     """
+    upload = None
     try:
         # Validate Cafe UUID
         cafe_uuid = UUID(cafe_id)
@@ -67,9 +79,10 @@ async def create_live_update(
         if not photo.filename:
             raise HTTPException(status_code=400, detail="No photo provided")
         
-        content = await photo.read()
-        # Use dynamic path: liveupdates/{cafe_id}
-        image_url = save_to_s3(content, photo.filename, f"liveupdates/{cafe_id}")
+        # Stream to S3 under a dynamic path: liveupdates/{cafe_id}
+        upload = await stream_to_s3(photo, f"liveupdates/{cafe_id}", keep_local_copy=True, db=db)
+        image_url = upload.url
+        variants = await generate_and_store_variants(db, image_url, upload.local_path)
         
         # Create live update in database
         live_update = LiveUpdates(
@@ -81,63 +94,137 @@ async def create_live_update(
         )
         
         db.add(live_update)
-        db.commit()
-        db.refresh(live_update)
+        await db.commit()
+        await db.refresh(live_update)
+        setattr(live_update, 'variants', variants)
         
         return live_update
     
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid Cafe ID format: {str(e)}")
     except Exception as e:
-        db.rollback()
-        import traceback
-        traceback.print_exc()
+        await db.rollback()
+        logger.exception(f"Error creating live update: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error creating live update: {str(e)}")
+    finally:
+        if upload and upload.local_path:
+            os.unlink(upload.local_path)
+
+
+def _encode_feed_cursor(created_at: datetime, story_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{story_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_feed_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, story_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(story_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# GET /liveUpdates/feed?lat=&lng=&radius_km=&cursor= - Active stories from nearby cafes, newest first
+@liveUpdates_router.get('/feed', response_model=StoryFeedPage)
+@cache_policy(PUBLIC_LIVE)
+def get_story_feed(
+    lat: float,
+    lng: float,
+    radius_km: float = Query(10, gt=0, le=100),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+) -> StoryFeedPage:
+    """
+    Keyset-paginated on (created_at, id): each page costs the same no matter how deep
+    the client scrolls, and stories posted meanwhile never shift or duplicate items.
+    """
+    lat_delta = radius_km / 111
+    # Degrees of longitude shrink towards the poles
+    lng_delta = radius_km / (111 * max(math.cos(math.radians(lat)), 0.01))
+
+    query = db.query(LiveUpdates, Cafe.name).join(Cafe, LiveUpdates.cafe_id == Cafe.id).filter(
+        LiveUpdates.expires_at > datetime.now(timezone.utc),
+        Cafe.latitude.between(lat - lat_delta, lat + lat_delta),
+        Cafe.longitude.between(lng - lng_delta, lng + lng_delta)
+    )
+    if cursor:
+        created_at, story_id = _decode_feed_cursor(cursor)
+        query = query.filter(tuple_(LiveUpdates.created_at, LiveUpdates.id) < tuple_(created_at, story_id))
+
+    # One extra row tells us whether another page exists
+    rows = query.order_by(LiveUpdates.created_at.desc(), LiveUpdates.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+
+    variants = load_variants(db, [update.image_url for update, _ in page])
+    items = []
+    for update, cafe_name in page:
+        setattr(update, 'variants', variants.get(update.image_url))
+        items.append(LiveUpdateUserResponse(**LiveUpdatePublic.model_validate(update).model_dump(), cafe_name=cafe_name))
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1][0]
+        next_cursor = _encode_feed_cursor(last.created_at, last.id)
+
+    return StoryFeedPage(items=items, next_cursor=next_cursor)
 
 
 # GET /liveUpdates/cafe/{cafe_id} - Get all active live updates for a cafe
 @liveUpdates_router.get('/cafe/{cafe_id}', response_model=list[LiveUpdatePublic])
+@cache_policy(PUBLIC_LIVE)
+@query_budget(3)
 async def get_cafe_live_updates(
     cafe_id: UUID,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> list[LiveUpdatePublic]:
     """
     Get all active (non-expired) live updates for a specific cafe.
     """
-    from datetime import datetime, timezone
-    
-    live_updates = db.query(LiveUpdates).filter(
-        LiveUpdates.cafe_id == cafe_id,
-        LiveUpdates.expires_at > datetime.now(timezone.utc)
-    ).order_by(LiveUpdates.created_at.desc()).all()
-    
-    
+    live_updates = (await db.execute(
+        queries.active_stories_for_cafe(cafe_id, datetime.now(timezone.utc))
+    )).scalars().all()
+
+    variants = await load_variants_async(db, [u.image_url for u in live_updates])
+    for update in live_updates:
+        setattr(update, 'variants', variants.get(update.image_url))
+
     return live_updates
 
 
 # GET /liveUpdates/user/{cognito_sub}
 @liveUpdates_router.get('/user/{cognito_sub}', response_model=list[dict])
+@cache_policy(PRIVATE)
 async def get_user_live_updates(
     cognito_sub: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all active live updates for a specific user, including cafe name.
     """
-    from datetime import datetime, timezone
-    
     # Query LiveUpdates joined with Cafe
     # Note: LiveUpdates.user_sub stores the cognito_sub directly
-    results = db.query(LiveUpdates, Cafe.name).join(Cafe, LiveUpdates.cafe_id == Cafe.id).filter(
-        LiveUpdates.user_sub == cognito_sub,
-        LiveUpdates.expires_at > datetime.now(timezone.utc)
-    ).order_by(LiveUpdates.created_at.desc()).all()
+    results = (await db.execute(
+        select(LiveUpdates, Cafe.name).join(Cafe, LiveUpdates.cafe_id == Cafe.id).where(
+            LiveUpdates.user_sub == cognito_sub,
+            LiveUpdates.expires_at > datetime.now(timezone.utc)
+        ).order_by(LiveUpdates.created_at.desc())
+    )).all()
     
+    variants = await load_variants_async(db, [update.image_url for update, _ in results])
+
     # Construct response
     response = []
     for update, cafe_name in results:
+        setattr(update, 'variants', variants.get(update.image_url))
         resp_item = LiveUpdatePublic.from_orm(update).dict()
         resp_item['cafe_name'] = cafe_name
         response.append(resp_item)
         
-    return response
\ No newline at end of file
+    return response
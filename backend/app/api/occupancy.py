@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.deps import get_db
-from app.db.model import Cafe, OccupancyHistory
+from app.db.deps import get_db, get_read_db
+from app.db.model import OccupancyHistory
+from app.db import queries
+from app.services import cafe_cache
 from app.schemas.occupancy import Occupancy, OccupancyHistoryPublic
+from app.core.http_cache import cache_policy, PUBLIC_PROFILE
+from app.db.query_stats import query_budget
 from typing import List
 from datetime import datetime, timedelta
 from uuid import UUID
@@ -12,7 +16,7 @@ router = APIRouter(prefix='/occupancy', tags=['occupancy'])
 @router.post('/', status_code=201)
 def update_occupancy(payload: Occupancy, db: Session = Depends(get_db)):
     # 1. Verify cafe exists
-    cafe = db.query(Cafe).filter(Cafe.id == payload.cafe_id).first()
+    cafe = db.execute(queries.cafe_by_id(payload.cafe_id)).scalars().first()
     if not cafe:
         raise HTTPException(status_code=404, detail="Cafe not found")
 
@@ -39,11 +43,14 @@ def update_occupancy(payload: Occupancy, db: Session = Depends(get_db)):
     db.add(cafe)
     db.add(history_entry)
     db.commit()
+    cafe_cache.invalidate_cafe(payload.cafe_id)
     
     return {"status": "success", "occupancy_level": level}
 
 @router.get('/history/{cafe_id}', response_model=List[OccupancyHistoryPublic])
-def get_occupancy_history(cafe_id: UUID, db: Session = Depends(get_db)):
+@cache_policy(PUBLIC_PROFILE)
+@query_budget(2)
+def get_occupancy_history(cafe_id: UUID, db: Session = Depends(get_read_db)):
     # Fetch history for the last 24 hours
     since = datetime.now() - timedelta(hours=24)
     history = db.query(OccupancyHistory).filter(
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from app.db.deps import get_db
 from app.db.model import Reservation, User, Cafe
 from app.schemas.reservations import ReservationCreate, ReservationPublic, ReservationUpdate
+from app.core.http_cache import cache_policy, PRIVATE
+from app.db.query_stats import query_budget
 from typing import List
 from uuid import UUID
 
@@ -42,35 +44,48 @@ def create_reservation(payload: ReservationCreate, db: Session = Depends(get_db)
     return new_reservation
 
 @router.get('/user/{user_sub}', response_model=List[ReservationPublic])
+@cache_policy(PRIVATE)
+@query_budget(2)
 def get_user_reservations(user_sub: str, db: Session = Depends(get_db)):
-    reservations = db.query(Reservation).filter(
+    # Cafe names are joined in; the user is the same for every row, so look it up once
+    rows = db.query(Reservation, Cafe.name).outerjoin(
+        Cafe, Cafe.id == Reservation.cafe_id
+    ).filter(
         Reservation.user_sub == user_sub
     ).order_by(Reservation.reservation_date.desc()).all()
-    
-    # Add cafe name to each reservation
-    for res in reservations:
-        cafe = db.query(Cafe).filter(Cafe.id == res.cafe_id).first()
-        user = db.query(User).filter(User.cognito_sub == res.user_sub).first()
-        setattr(res, 'cafe_name', cafe.name if cafe else "Unknown")
-        setattr(res, 'user_name', user.username if user else "Unknown")
-        
+
+    user = db.query(User).filter(User.cognito_sub == user_sub).first()
+    user_name = user.username if user else "Unknown"
+
+    reservations = []
+    for res, cafe_name in rows:
+        setattr(res, 'cafe_name', cafe_name or "Unknown")
+        setattr(res, 'user_name', user_name)
+        reservations.append(res)
+
     return reservations
 
 @router.get('/cafe/{cafe_id}', response_model=List[ReservationPublic])
+@cache_policy(PRIVATE)
+@query_budget(2)
 def get_cafe_reservations(cafe_id: UUID, db: Session = Depends(get_db)):
-    reservations = db.query(Reservation).filter(
+    # Usernames are joined in instead of one lookup per reservation
+    rows = db.query(Reservation, User.username).outerjoin(
+        User, User.cognito_sub == Reservation.user_sub
+    ).filter(
         Reservation.cafe_id == cafe_id
     ).order_by(Reservation.reservation_date.desc()).all()
-    
+
     # Get cafe name once
     cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
     cafe_name = cafe.name if cafe else "Unknown"
-    
-    for res in reservations:
-        user = db.query(User).filter(User.cognito_sub == res.user_sub).first()
+
+    reservations = []
+    for res, username in rows:
         setattr(res, 'cafe_name', cafe_name)
-        setattr(res, 'user_name', user.username if user else "Unknown User")
-        
+        setattr(res, 'user_name', username or "Unknown User")
+        reservations.append(res)
+
     return reservations
 
 @router.patch('/{reservation_id}', response_model=ReservationPublic)
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.db.deps import get_db
-from app.db.model import Review, User, Cafe, Checkin
+from app.db.deps import get_db, get_read_db
+from app.db.model import Review, User
+from app.db import queries
+from app.services import cafe_cache
 from app.schemas.reviews import ReviewCreate, ReviewPublic
+from app.core.http_cache import cache_policy, PUBLIC_PROFILE
+from app.db.query_stats import query_budget
 from typing import List
 from uuid import UUID
 from datetime import datetime, date, time
@@ -13,23 +17,19 @@ router = APIRouter(prefix='/reviews', tags=['reviews'])
 @router.post('/', response_model=ReviewPublic, status_code=201)
 def create_review(payload: ReviewCreate, db: Session = Depends(get_db)):
     # 1. Verify user exists
-    user = db.query(User).filter(User.cognito_sub == payload.user_sub).first()
+    user = db.execute(queries.user_by_sub(payload.user_sub)).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # 2. Verify cafe exists
-    cafe = db.query(Cafe).filter(Cafe.id == payload.cafe_id).first()
+    cafe = db.execute(queries.cafe_by_id(payload.cafe_id)).scalars().first()
     if not cafe:
         raise HTTPException(status_code=404, detail="Cafe not found")
 
     # 3. Verify user has checked in today (Requirement: must be checked in to review)
     today = date.today()
     start_of_day = datetime.combine(today, time.min)
-    checkin = db.query(Checkin).filter(
-        Checkin.user_sub == payload.user_sub,
-        Checkin.cafe_id == payload.cafe_id,
-        Checkin.created_at >= start_of_day
-    ).first()
+    checkin = db.execute(queries.latest_checkin_since(payload.user_sub, payload.cafe_id, start_of_day)).scalars().first()
     
     if not checkin:
         raise HTTPException(status_code=403, detail="Check-in required to leave a review")
@@ -66,6 +66,8 @@ def create_review(payload: ReviewCreate, db: Session = Depends(get_db)):
     
     db.add(cafe)
     db.commit()
+    # avg_rating changed
+    cafe_cache.invalidate_cafe(payload.cafe_id)
     db.refresh(new_review)
     
     # Map username for response
@@ -74,12 +76,17 @@ def create_review(payload: ReviewCreate, db: Session = Depends(get_db)):
     return new_review
 
 @router.get('/cafe/{cafe_id}', response_model=List[ReviewPublic])
-def get_cafe_reviews(cafe_id: UUID, db: Session = Depends(get_db)):
-    reviews = db.query(Review).filter(Review.cafe_id == cafe_id).order_by(Review.created_at.desc()).all()
-    
-    # Add username to each review object for the response
-    for review in reviews:
-        user = db.query(User).filter(User.cognito_sub == review.user_sub).first()
-        setattr(review, 'username', user.username if user else "Unknown")
-        
+@cache_policy(PUBLIC_PROFILE)
+@query_budget(2)
+def get_cafe_reviews(cafe_id: UUID, db: Session = Depends(get_read_db)):
+    # Usernames come from the same query; a lookup per review made this 1 + N queries
+    rows = db.query(Review, User.username).outerjoin(
+        User, User.cognito_sub == Review.user_sub
+    ).filter(Review.cafe_id == cafe_id).order_by(Review.created_at.desc()).all()
+
+    reviews = []
+    for review, username in rows:
+        setattr(review, 'username', username or "Unknown")
+        reviews.append(review)
+
     return reviews
@@ -1,52 +1,208 @@
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-import boto3
+from pydantic import BaseModel, Field
 import os
 import uuid
-from typing import Literal
-from app.db.deps import get_db
+import hashlib
+from functools import lru_cache
+from typing import Literal, Optional, Dict, List
+from app.db.deps import get_db, get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.schemas.cafes import ImageVariants
+from app.services.upload import key_from_url, get_s3
+from app.services import content_store
+from app.services.images import generate_and_store_variants
+from app.core.logger import app_logger as logger
 
 router = APIRouter(prefix='/upload', tags=['upload'])
 
-s3_client = boto3.client('s3')
 BUCKET_NAME = os.getenv('CAFE_PHOTOS_BUCKET')
 
+PRESIGN_EXPIRES_IN = 3600  # 1 hour
+MAX_BATCH_PRESIGN = 50
+MAX_POST_UPLOAD_BYTES = 25 * 1024 * 1024
+
 class PresignedUrlRequest(BaseModel):
     filename: str
     file_type: str
     category: Literal['cover_photo', 'cafe_photo', 'menu_photo', 'cafe_user_uploads', 'live_update']
+    # Optional hex sha256 of the file; enables content-addressed keys and duplicate short-circuiting
+    sha256: Optional[str] = Field(None, pattern=r'^[0-9a-f]{64}$')
 
 class PresignedUrlResponse(BaseModel):
-    upload_url: str
+    # None when already_uploaded: the identical file is stored at file_url, skip the upload
+    upload_url: Optional[str] = None
     file_url: str
+    already_uploaded: bool = False
+    # Only set for POST policies: form fields the client must send along with the file
+    fields: Optional[Dict[str, str]] = None
+
+class BatchPresignedUrlRequest(BaseModel):
+    files: List[PresignedUrlRequest] = Field(..., min_length=1, max_length=MAX_BATCH_PRESIGN)
+    method: Literal['put', 'post'] = 'put'
+
+class BatchPresignedUrlResponse(BaseModel):
+    uploads: List[PresignedUrlResponse]
+
+
+# Set once a region is known for sure; a failed lookup is never stored
+_resolved_region: Optional[str] = None
+
+
+def _bucket_region() -> str:
+    """
+    CAFE_PHOTOS_BUCKET_REGION skips the lookup entirely; otherwise one GetBucketLocation
+    call per process. If that call fails the Lambda region is used for this call only and
+    the lookup is retried next time, so a transient error cannot pin a warm instance to
+    the wrong region.
+    """
+    global _resolved_region
+    if _resolved_region:
+        return _resolved_region
+    region = os.getenv('CAFE_PHOTOS_BUCKET_REGION')
+    if region:
+        _resolved_region = region
+        return region
+    try:
+        _resolved_region = get_s3().get_bucket_location(Bucket=BUCKET_NAME).get('LocationConstraint') or 'us-east-1'
+        return _resolved_region
+    except Exception as e:
+        logger.warning(f"Could not resolve bucket region, falling back to AWS_REGION: {str(e)}")
+        return os.getenv('AWS_REGION', 'us-east-1')
+
+
+def _signing_client():
+    """
+    Client pinned to the bucket's region with SigV4 and virtual-hosted URLs, so generating
+    presigned URLs is pure local CPU work (no redirects, no credential round trips per call).
+    """
+    return _signing_client_for(_bucket_region())
+
+
+@lru_cache(maxsize=4)
+def _signing_client_for(region: str):
+    import boto3
+    from botocore.config import Config as BotoConfig
+
+    return boto3.client(
+        's3',
+        region_name=region,
+        config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'virtual'})
+    )
+
+
+def _presign(request: PresignedUrlRequest, method: str, existing_url: Optional[str] = None) -> dict:
+    if existing_url:
+        return {"upload_url": None, "file_url": existing_url, "already_uploaded": True}
+
+    file_extension = request.filename.split('.')[-1] if '.' in request.filename else 'jpg'
+    if request.sha256:
+        # Canonical key; S3 rejects the upload unless the bytes match the declared checksum,
+        # so whatever ends up at this key is exactly the hashed content
+        key = content_store.content_key(request.category, request.sha256, file_extension)
+        checksum = content_store.sha256_b64(request.sha256)
+    else:
+        key = f"{request.category}/{uuid.uuid4()}.{file_extension}"
+        checksum = None
+    file_url = f"https://{BUCKET_NAME}.s3.{_bucket_region()}.amazonaws.com/{key}"
+
+    if method == 'post':
+        fields = {'Content-Type': request.file_type}
+        if checksum:
+            fields.update({'x-amz-checksum-algorithm': 'SHA256', 'x-amz-checksum-sha256': checksum})
+        post = _signing_client().generate_presigned_post(
+            Bucket=BUCKET_NAME,
+            Key=key,
+            Fields=fields,
+            Conditions=[{k: v} for k, v in fields.items()] + [
+                ['content-length-range', 1, MAX_POST_UPLOAD_BYTES]
+            ],
+            ExpiresIn=PRESIGN_EXPIRES_IN
+        )
+        return {"upload_url": post['url'], "file_url": file_url, "fields": post['fields']}
+
+    params = {
+        'Bucket': BUCKET_NAME,
+        'Key': key,
+        'ContentType': request.file_type
+    }
+    if checksum:
+        params['ChecksumSHA256'] = checksum
+    presigned_url = _signing_client().generate_presigned_url(
+        'put_object',
+        Params=params,
+        ExpiresIn=PRESIGN_EXPIRES_IN
+    )
+    return {"upload_url": presigned_url, "file_url": file_url}
+
+
+def _known_uploads(db: Session, files: List[PresignedUrlRequest]) -> Dict[tuple, str]:
+    return content_store.lookup_many(db, [(f.category, f.sha256) for f in files if f.sha256])
+
 
 @router.post('/presigned-url', response_model=PresignedUrlResponse)
-async def get_presigned_url(request: PresignedUrlRequest):
+def get_presigned_url(request: PresignedUrlRequest, db: Session = Depends(get_db)):
     if not BUCKET_NAME:
         raise HTTPException(status_code=500, detail="S3 bucket not configured")
 
-    file_extension = request.filename.split('.')[-1] if '.' in request.filename else 'jpg'
-    file_id = str(uuid.uuid4())
-    key = f"{request.category}/{file_id}.{file_extension}"
-
     try:
-        presigned_url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': BUCKET_NAME,
-                'Key': key,
-                'ContentType': request.file_type
-            },
-            ExpiresIn=3600 # 1 hour
-        )
+        known = _known_uploads(db, [request])
+        return _presign(request, 'put', known.get((request.category, request.sha256)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        region = s3_client.get_bucket_location(Bucket=BUCKET_NAME).get('LocationConstraint') or 'us-east-1'
-        file_url = f"https://{BUCKET_NAME}.s3.{region}.amazonaws.com/{key}"
 
-        return {
-            "upload_url": presigned_url,
-            "file_url": file_url
-        }
+# POST /upload/presigned-urls - presign a whole batch (e.g. every onboarding photo) in one call
+@router.post('/presigned-urls', response_model=BatchPresignedUrlResponse)
+def get_presigned_urls(request: BatchPresignedUrlRequest, db: Session = Depends(get_db)):
+    if not BUCKET_NAME:
+        raise HTTPException(status_code=500, detail="S3 bucket not configured")
+
+    try:
+        # One index query for the whole batch; files already stored need no upload at all
+        known = _known_uploads(db, request.files)
+        return {"uploads": [
+            _presign(f, request.method, known.get((f.category, f.sha256))) for f in request.files
+        ]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+class VariantsRequest(BaseModel):
+    file_url: str
+
+class VariantsResponse(ImageVariants):
+    # Canonical URL for these bytes. When the same file was already stored (deduplicated),
+    # it differs from the requested file_url and the client should keep this one instead.
+    file_url: str
+    deduplicated: bool = False
+
+# POST /upload/variants - build resized variants for an image uploaded via a presigned URL
+@router.post('/variants', response_model=VariantsResponse)
+async def create_image_variants(request: VariantsRequest, db: AsyncSession = Depends(get_async_db)):
+    key = key_from_url(request.file_url, BUCKET_NAME)
+    if not key:
+        raise HTTPException(status_code=400, detail="file_url does not point into the photos bucket")
+
+    try:
+        obj = await run_in_threadpool(get_s3().get_object, Bucket=BUCKET_NAME, Key=key)
+        content = await run_in_threadpool(obj['Body'].read)
+    except get_s3().exceptions.NoSuchKey:
+        raise HTTPException(status_code=404, detail="Uploaded file not found")
+
+    # Verify-after-upload: index the bytes so later presign requests for them short-circuit
+    category = key.rsplit('/', 1)[0]
+    file_url = await content_store.record_async(db, category, hashlib.sha256(content).hexdigest(), request.file_url, len(content), obj.get('ContentType'))
+
+    # Same bytes already stored under another key: reuse that copy and its variants rather
+    # than building a second set. The new object is left in place since the client may
+    # already reference it; the response tells it which URL to keep.
+    variants = await generate_and_store_variants(db, file_url, content)
+    if not variants:
+        raise HTTPException(status_code=422, detail="Could not process image")
+    return VariantsResponse(
+        **ImageVariants.model_validate(variants).model_dump(),
+        file_url=file_url,
+        deduplicated=file_url != request.file_url
+    )
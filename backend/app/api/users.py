@@ -1,10 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.db.deps import get_db
-from app.db.model import User, Cafe
-from app.schemas.users import UserCreate, UserPublic, UserPreferences, UserUpdate
+from sqlalchemy.orm import Session, noload
+from sqlalchemy import delete, select, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from app.db.deps import get_db, run_with_session
+from app.db import queries
+from app.db.model import User, Cafe, LiveUpdates, Reservation, Checkin, user_saved_cafes
+from app.schemas.users import (
+    UserCreate, UserPublic, UserPreferences, UserUpdate, SavedCafesSync, SavedCafesSyncResult,
+    SavedCafeStatus, UserProfileBundle, ProfileBundle
+)
+from app.schemas.liveUpdate import LiveUpdatePublic, LiveUpdateUserResponse
+from app.schemas.reservations import ReservationPublic
 from typing import List
+from uuid import UUID
+from datetime import datetime, date, time, timezone
+import asyncio
 from app.core.logger import app_logger as logger
+from app.core.http_cache import cache_policy, PRIVATE
 
 router = APIRouter(prefix='/users', tags=['users'])
 
@@ -13,7 +26,7 @@ router = APIRouter(prefix='/users', tags=['users'])
 def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     try:
         # Check if user already exists by cognito_sub
-        existing_user = db.query(User).filter(User.cognito_sub == payload.cognito_sub).first()
+        existing_user = db.execute(queries.user_by_sub(payload.cognito_sub)).scalars().first()
         if existing_user:
             logger.info(f"User already exists: {payload.email}")
             return existing_user
@@ -35,23 +48,98 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
 
 #GET /users
 @router.get('/', response_model=List[UserPublic])
+@cache_policy(PRIVATE)
 def get_users(db: Session = Depends(get_db)):
     users = db.query(User).all()
     return users
 
 # GET /users/{cognito_sub}
 @router.get('/{cognito_sub}', response_model=UserPublic)
+@cache_policy(PRIVATE)
 def get_user(cognito_sub: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.cognito_sub == cognito_sub).first()
+    user = db.execute(queries.user_by_sub(cognito_sub)).scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
+# Profile bundle loaders: each runs on its own session so they can be gathered concurrently.
+# They return plain schema objects because the session is closed once the loader returns.
+def _load_bundle_user(db: Session, cognito_sub: str):
+    user = db.query(User).options(noload(User.saved_cafes)).filter(User.cognito_sub == cognito_sub).first()
+    return UserProfileBundle.model_validate(user) if user else None
+
+def _load_bundle_saved_cafes(db: Session, cognito_sub: str):
+    cafes = db.query(Cafe).join(
+        user_saved_cafes, user_saved_cafes.c.cafe_id == Cafe.id
+    ).filter(user_saved_cafes.c.user_sub == cognito_sub).all()
+    return [SavedCafeStatus.model_validate(cafe) for cafe in cafes]
+
+def _load_bundle_active_stories(db: Session, cognito_sub: str):
+    results = db.query(LiveUpdates, Cafe.name).join(Cafe, LiveUpdates.cafe_id == Cafe.id).filter(
+        LiveUpdates.user_sub == cognito_sub,
+        LiveUpdates.expires_at > datetime.now(timezone.utc)
+    ).order_by(LiveUpdates.created_at.desc()).all()
+    return [
+        LiveUpdateUserResponse(**LiveUpdatePublic.model_validate(update).model_dump(), cafe_name=cafe_name)
+        for update, cafe_name in results
+    ]
+
+def _load_bundle_upcoming_reservations(db: Session, cognito_sub: str):
+    start_of_day = datetime.combine(date.today(), time.min)
+    results = db.query(Reservation, Cafe.name, User.username).join(
+        Cafe, Reservation.cafe_id == Cafe.id
+    ).join(
+        User, Reservation.user_sub == User.cognito_sub
+    ).filter(
+        Reservation.user_sub == cognito_sub,
+        Reservation.reservation_date >= start_of_day,
+        Reservation.status.in_(["pending", "confirmed"])
+    ).order_by(Reservation.reservation_date.asc()).all()
+    return [
+        ReservationPublic.model_validate(res).model_copy(update={"cafe_name": cafe_name, "user_name": username})
+        for res, cafe_name, username in results
+    ]
+
+def _load_bundle_today_checkins(db: Session, cognito_sub: str):
+    start_of_day = datetime.combine(date.today(), time.min)
+    checkins = db.query(Checkin.cafe_id).filter(
+        Checkin.user_sub == cognito_sub,
+        Checkin.created_at >= start_of_day
+    ).all()
+    return [c[0] for c in checkins]
+
+# GET /users/{cognito_sub}/profile-bundle
+@router.get('/{cognito_sub}/profile-bundle', response_model=ProfileBundle)
+@cache_policy(PRIVATE)
+async def get_profile_bundle(cognito_sub: str):
+    """
+    Everything the profile screen needs in one round trip: user, saved cafes with
+    current occupancy, active stories, upcoming reservations and today's check-ins.
+    """
+    user, saved_cafes, active_stories, reservations, checkins = await asyncio.gather(
+        run_with_session(_load_bundle_user, cognito_sub),
+        run_with_session(_load_bundle_saved_cafes, cognito_sub),
+        run_with_session(_load_bundle_active_stories, cognito_sub),
+        run_with_session(_load_bundle_upcoming_reservations, cognito_sub),
+        run_with_session(_load_bundle_today_checkins, cognito_sub),
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.saved_cafes = saved_cafes
+    return ProfileBundle(
+        user=user,
+        active_stories=active_stories,
+        upcoming_reservations=reservations,
+        today_checkins=checkins
+    )
+
+
 # PATCH /users/{cognito_sub}
 @router.patch('/{cognito_sub}', response_model=UserPublic)
 def update_user(cognito_sub: str, payload: UserUpdate, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.cognito_sub == cognito_sub).first()
+    user = db.execute(queries.user_by_sub(cognito_sub)).scalars().first()
     if not user:
         logger.warning(f"User not found for update: {cognito_sub}")
         raise HTTPException(status_code=404, detail="User not found")
@@ -83,41 +171,86 @@ def update_user(cognito_sub: str, payload: UserUpdate, db: Session = Depends(get
     return user
 
 
-# POST /users/{cognito_sub}/saved_cafes/{cafe_id}
-@router.post('/{cognito_sub}/saved_cafes/{cafe_id}', status_code=200)
-def save_cafe(cognito_sub: str, cafe_id: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.cognito_sub == cognito_sub).first()
-    if not user:
+def _raise_missing_user_or_cafe(db: Session, cognito_sub: str, cafe_id: UUID):
+    # Only reached on the slow path, to keep the 404 messages the clients rely on
+    if not db.query(User.cognito_sub).filter(User.cognito_sub == cognito_sub).first():
         raise HTTPException(status_code=404, detail="User not found")
-        
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
-    if not cafe:
+    if not db.query(Cafe.id).filter(Cafe.id == cafe_id).first():
         raise HTTPException(status_code=404, detail="Cafe not found")
-        
-    if cafe not in user.saved_cafes:
-        user.saved_cafes.append(cafe)
+
+
+# POST /users/{cognito_sub}/saved_cafes/{cafe_id}
+@router.post('/{cognito_sub}/saved_cafes/{cafe_id}', status_code=200)
+def save_cafe(cognito_sub: str, cafe_id: UUID, db: Session = Depends(get_db)):
+    # Single INSERT; the foreign keys reject unknown users/cafes
+    stmt = pg_insert(user_saved_cafes).values(
+        user_sub=cognito_sub, cafe_id=cafe_id
+    ).on_conflict_do_nothing()
+    try:
+        db.execute(stmt)
         db.commit()
-        
+    except IntegrityError:
+        db.rollback()
+        _raise_missing_user_or_cafe(db, cognito_sub, cafe_id)
+        # Both rows exist now: one of them was deleted and recreated concurrently
+        raise HTTPException(status_code=409, detail="Cafe could not be saved, please retry")
+
     return {"message": "Cafe saved"}
 
 # DELETE /users/{cognito_sub}/saved_cafes/{cafe_id}
 @router.delete('/{cognito_sub}/saved_cafes/{cafe_id}', status_code=200)
-def unsave_cafe(cognito_sub: str, cafe_id: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.cognito_sub == cognito_sub).first()
-    if not user:
+def unsave_cafe(cognito_sub: str, cafe_id: UUID, db: Session = Depends(get_db)):
+    result = db.execute(
+        delete(user_saved_cafes).where(
+            user_saved_cafes.c.user_sub == cognito_sub,
+            user_saved_cafes.c.cafe_id == cafe_id
+        )
+    )
+    db.commit()
+
+    if result.rowcount == 0:
+        _raise_missing_user_or_cafe(db, cognito_sub, cafe_id)
+
+    return {"message": "Cafe unsaved"}
+
+# PUT /users/{cognito_sub}/saved_cafes
+@router.put('/{cognito_sub}/saved_cafes', response_model=SavedCafesSyncResult)
+def sync_saved_cafes(cognito_sub: str, payload: SavedCafesSync, db: Session = Depends(get_db)):
+    """
+    Apply a client's offline add/remove diff in one transaction and return the resulting saved set.
+    Unknown cafe ids in `add` are skipped (e.g. cafes deleted while the client was offline).
+    """
+    if not db.query(User.cognito_sub).filter(User.cognito_sub == cognito_sub).first():
         raise HTTPException(status_code=404, detail="User not found")
-        
-    cafe = db.query(Cafe).filter(Cafe.id == cafe_id).first()
-    if not cafe:
-        # If cafe doesn't exist, we can't remove it, but user might have a stale reference? 
-        # Actually sqlalchemy would handle it or error. But let's check.
-        raise HTTPException(status_code=404, detail="Cafe not found")
 
-    if cafe in user.saved_cafes:
-        user.saved_cafes.remove(cafe)
+    to_remove = set(payload.remove)
+    to_add = set(payload.add) - to_remove
+
+    try:
+        if to_add:
+            db.execute(
+                pg_insert(user_saved_cafes).from_select(
+                    ['user_sub', 'cafe_id'],
+                    select(literal(cognito_sub), Cafe.id).where(Cafe.id.in_(to_add))
+                ).on_conflict_do_nothing()
+            )
+        if to_remove:
+            db.execute(
+                delete(user_saved_cafes).where(
+                    user_saved_cafes.c.user_sub == cognito_sub,
+                    user_saved_cafes.c.cafe_id.in_(to_remove)
+                )
+            )
+        saved_ids = db.execute(
+            select(user_saved_cafes.c.cafe_id).where(user_saved_cafes.c.user_sub == cognito_sub)
+        ).scalars().all()
         db.commit()
-        
-    return {"message": "Cafe unsaved"}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error syncing saved cafes for {cognito_sub}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error syncing saved cafes: {str(e)}")
+
+    return {"saved_cafe_ids": saved_ids}
 
 
 # DELETE /users/{cognito_sub}
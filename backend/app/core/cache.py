@@ -0,0 +1,475 @@
+# backend/app/core/cache.py
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import app_logger as logger
+
+# CACHE_BACKEND:
+#   memory - per-process LRU (default). Invalidation only reaches the instance that wrote.
+#   redis  - shared through any Redis-protocol server at CACHE_REDIS_URL (ElastiCache,
+#            Valkey, or a local redis-server/KeyDB stand-in). Invalidation is global.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "4096"))
+# On a shared backend, how long a miss waits for another instance that is already
+# loading the same key before loading it itself
+CACHE_FILL_WAIT_SECONDS = float(os.getenv("CACHE_FILL_WAIT_SECONDS", "0.5"))
+# How long a miss waits on a load already running in this process before giving up on it
+# and loading the key itself
+CACHE_COALESCE_WAIT_SECONDS = float(os.getenv("CACHE_COALESCE_WAIT_SECONDS", "10"))
+
+_FILL_POLL_SECONDS = 0.025
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def add(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if absent (or expired); True if this call stored it."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MemoryBackend(LRUCache):
+    name = "memory"
+    shared = False
+    blocking = False
+
+
+class RedisBackend:
+    """Values are stored as JSON, so cached payloads must be JSON-serializable."""
+
+    name = "redis"
+    shared = True
+    blocking = True
+
+    def __init__(self, url: str = CACHE_REDIS_URL):
+        import redis  # only needed when CACHE_BACKEND=redis
+
+        # Short timeouts: a slow cache must degrade to a miss, not stall the request
+        self._client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._client.set(key, json.dumps(value, default=str), px=max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        return bool(self._client.set(key, json.dumps(value, default=str), px=max(1, int(ttl * 1000)), nx=True))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self._client.delete(*keys)
+
+
+@lru_cache(maxsize=1)
+def get_cache_backend():
+    """Process-wide backend shared by every Cache; keys are namespaced per cache."""
+    if CACHE_BACKEND == "redis":
+        return RedisBackend(CACHE_REDIS_URL)
+    return MemoryBackend(max_entries=CACHE_MAX_ENTRIES)
+
+
+class CacheStats:
+    """Counters for one cache; cheap enough to update on every lookup."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.coalesce_abandoned = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.stale_if_error = 0
+        self.backend_errors = 0
+        self.lookup_seconds_total = 0.0
+        self.lookup_seconds_max = 0.0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_lookup(self, seconds: float):
+        with self._lock:
+            self.lookup_seconds_total += seconds
+            self.lookup_seconds_max = max(self.lookup_seconds_max, seconds)
+
+    def record_load(self, seconds: float):
+        with self._lock:
+            self.loads += 1
+            self.load_seconds_total += seconds
+            self.load_seconds_max = max(self.load_seconds_max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "coalesced": self.coalesced,
+                "coalesce_abandoned": self.coalesce_abandoned,
+                "loads": self.loads,
+                "load_errors": self.load_errors,
+                "stale_if_error": self.stale_if_error,
+                "backend_errors": self.backend_errors,
+                "lookup_seconds_avg": round(self.lookup_seconds_total / lookups, 6) if lookups else 0.0,
+                "lookup_seconds_max": round(self.lookup_seconds_max, 6),
+                "load_seconds_avg": round(self.load_seconds_total / self.loads, 6) if self.loads else 0.0,
+                "load_seconds_max": round(self.load_seconds_max, 6),
+            }
+
+
+_caches: Dict[str, "Cache"] = {}
+
+# Lookup results: value plus whether it is fresh, stale (serve and revalidate), or only
+# good as a fallback if reloading fails
+FRESH, STALE, FALLBACK = "fresh", "stale", "fallback"
+
+
+class Cache:
+    """
+    Read-through cache over a pluggable backend.
+
+    - single-flight: concurrent misses for a key in this process share one load; on a
+      shared backend a fill lease also makes other instances wait briefly for that load
+    - stale-while-revalidate: for `stale_ttl` after expiry the old value is served while
+      one background load refreshes it
+    - stale-if-error: for `error_ttl` after expiry the old value is served if the load fails
+
+    Loaders must not depend on request-scoped state (e.g. the request's DB session), since
+    revalidation can outlive the request. A loader returning None is not cached.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0, error_ttl: float = 0.0, backend=None):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.error_ttl = max(error_ttl, stale_ttl)
+        self.backend = backend or get_cache_backend()
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._background: set = set()
+        # Bumped by every delete; a load that started earlier must not store its result
+        self._generation = 0
+        _caches[name] = self
+
+    def _key(self, key) -> str:
+        return f"{self.name}:{key}"
+
+    # ---- backend access (errors degrade to misses) ----
+
+    def _read(self, key) -> Optional[Tuple[Any, str]]:
+        try:
+            entry = self.backend.get(self._key(key))
+        except Exception as e:
+            self.stats.incr("backend_errors")
+            logger.warning(f"Cache {self.name} read failed: {str(e)}")
+            return None
+        if entry is None:
+            return None
+        value, fresh_until = entry
+        now = time.time()
+        if now < fresh_until:
+            return value, FRESH
+        if now < fresh_until + self.stale_ttl:
+            return value, STALE
+        return value, FALLBACK
+
+    def _write(self, key, value, generation: Optional[int] = None) -> None:
+        if value is None or (generation is not None and generation != self._generation):
+            return
+        try:
+            self.backend.set(self._key(key), [value, time.time() + self.ttl], self.ttl + self.error_ttl)
+        except Exception as e:
+            self.stats.incr("backend_errors")
+            logger.warning(f"Cache {self.name} write failed: {str(e)}")
+
+    def _acquire_fill_lease(self, key) -> bool:
+        if not self.backend.shared:
+            return True
+        try:
+            return self.backend.add(self._key(key) + ":fill", 1, CACHE_FILL_WAIT_SECONDS * 2)
+        except Exception:
+            return True
+
+    def _release_fill_lease(self, key) -> None:
+        if self.backend.shared:
+            try:
+                self.backend.delete(self._key(key) + ":fill")
+            except Exception:
+                pass
+
+    # ---- public API ----
+
+    def set(self, key, value) -> None:
+        self._write(key, value)
+
+    def delete(self, *keys) -> None:
+        with self._lock:
+            self._generation += 1
+        try:
+            self.backend.delete(*(self._key(k) for k in keys))
+        except Exception as e:
+            self.stats.incr("backend_errors")
+            logger.warning(f"Cache {self.name} delete failed: {str(e)}")
+
+    def _join(self, key) -> Tuple[Future, bool]:
+        """The in-flight load for key, and whether the caller has to perform it."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _finish(self, key, future: Future, value=None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(value)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # Cancelled (or interrupted) leader: wake the waiters, which then load themselves
+            future.cancel()
+
+    def _lookup(self, key) -> Optional[Tuple[Any, str]]:
+        start = time.perf_counter()
+        found = self._read(key)
+        self.stats.record_lookup(time.perf_counter() - start)
+        if found is None or found[1] == FALLBACK:
+            self.stats.incr("misses")
+        elif found[1] == FRESH:
+            self.stats.incr("hits")
+        else:
+            self.stats.incr("stale_hits")
+        return found
+
+    def _on_load_error(self, e: Exception, fallback: Optional[Tuple[Any, str]]):
+        self.stats.incr("load_errors")
+        if fallback is None:
+            raise e
+        self.stats.incr("stale_if_error")
+        logger.warning(f"Cache {self.name} load failed, serving stale value: {str(e)}")
+        return fallback[0]
+
+    # sync
+
+    def _load(self, key, loader: Callable[[], Any], fallback=None):
+        future, leader = self._join(key)
+        if not leader:
+            self.stats.incr("coalesced")
+            try:
+                return future.result(timeout=CACHE_COALESCE_WAIT_SECONDS)
+            except (TimeoutError, CancelledError):
+                # The load this call joined is stuck or was cancelled
+                self.stats.incr("coalesce_abandoned")
+                return self._fill(key, loader, fallback)
+
+        # Settled on every exit, cancellation included, so no later caller waits on a dead load
+        try:
+            value = self._fill(key, loader, fallback)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    def _fill(self, key, loader: Callable[[], Any], fallback=None):
+        generation = self._generation
+        try:
+            if not self._acquire_fill_lease(key):
+                # Another instance is loading it; give it a moment to fill the shared entry
+                deadline = time.monotonic() + CACHE_FILL_WAIT_SECONDS
+                while time.monotonic() < deadline:
+                    time.sleep(_FILL_POLL_SECONDS)
+                    found = self._read(key)
+                    if found is not None and found[1] != FALLBACK:
+                        return found[0]
+            start = time.perf_counter()
+            try:
+                value = loader()
+            finally:
+                self.stats.record_load(time.perf_counter() - start)
+                self._release_fill_lease(key)
+            self._write(key, value, generation)
+            return value
+        except Exception as e:
+            return self._on_load_error(e, fallback)
+
+    def get_or_load(self, key, loader: Callable[[], Any]):
+        found = self._lookup(key)
+        if found is not None and found[1] == FRESH:
+            return found[0]
+        if found is not None and found[1] == STALE:
+            with self._lock:
+                refreshing = key in self._inflight
+            if not refreshing:
+                threading.Thread(
+                    target=self._revalidate, args=(key, loader, found), name=f"cache-{self.name}", daemon=True
+                ).start()
+            return found[0]
+        return self._load(key, loader, fallback=found)
+
+    def _revalidate(self, key, loader, fallback):
+        try:
+            self._load(key, loader, fallback=fallback)
+        except Exception as e:
+            logger.warning(f"Cache {self.name} background refresh failed: {str(e)}")
+
+    # async
+
+    async def _backend_call(self, fn, *args):
+        # Network backends would block the event loop; the memory backend is just a dict
+        if self.backend.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def _aload(self, key, loader: Callable[[], Awaitable[Any]], fallback=None):
+        future, leader = self._join(key)
+        if not leader:
+            self.stats.incr("coalesced")
+            # Shielded: a waiter timing out or being cancelled must not cancel the shared load
+            waiting = asyncio.wrap_future(future)
+            waiting.add_done_callback(_consume_result)
+            try:
+                return await asyncio.wait_for(asyncio.shield(waiting), CACHE_COALESCE_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # The load this call joined is stuck or was cancelled
+            self.stats.incr("coalesce_abandoned")
+            return await self._afill(key, loader, fallback)
+
+        # Settled on every exit, cancellation included, so no later caller waits on a dead load
+        try:
+            value = await self._afill(key, loader, fallback)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    async def _afill(self, key, loader: Callable[[], Awaitable[Any]], fallback=None):
+        generation = self._generation
+        try:
+            if not await self._backend_call(self._acquire_fill_lease, key):
+                deadline = time.monotonic() + CACHE_FILL_WAIT_SECONDS
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(_FILL_POLL_SECONDS)
+                    found = await self._backend_call(self._read, key)
+                    if found is not None and found[1] != FALLBACK:
+                        return found[0]
+            start = time.perf_counter()
+            try:
+                value = await loader()
+            finally:
+                self.stats.record_load(time.perf_counter() - start)
+                await self._backend_call(self._release_fill_lease, key)
+            await self._backend_call(self._write, key, value, generation)
+            return value
+        except Exception as e:
+            return self._on_load_error(e, fallback)
+
+    async def aget_or_load(self, key, loader: Callable[[], Awaitable[Any]]):
+        found = await self._backend_call(self._lookup, key)
+        if found is not None and found[1] == FRESH:
+            return found[0]
+        if found is not None and found[1] == STALE:
+            with self._lock:
+                refreshing = key in self._inflight
+            if not refreshing:
+                task = asyncio.get_running_loop().create_task(self._arevalidate(key, loader, found))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return found[0]
+        return await self._aload(key, loader, fallback=found)
+
+    async def _arevalidate(self, key, loader, fallback):
+        try:
+            await self._aload(key, loader, fallback=fallback)
+        except Exception as e:
+            logger.warning(f"Cache {self.name} background refresh failed: {str(e)}")
+
+
+def _consume_result(future: asyncio.Future) -> None:
+    # A waiter that stopped waiting leaves nobody to read the shared load's error; read it
+    # here so asyncio does not log it as never retrieved
+    if not future.cancelled():
+        future.exception()
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Counters for every cache in the process, for the health endpoint."""
+    return {
+        "backend": get_cache_backend().name,
+        "caches": {name: cache.stats.snapshot() for name, cache in _caches.items()},
+    }
@@ -0,0 +1,201 @@
+# backend/app/core/http_cache.py
+"""
+HTTP caching policy per route.
+
+Endpoints declare how their responses may be cached with @cache_policy(...) under the
+route decorator; HTTPCacheMiddleware turns that into Cache-Control/Vary headers, adds an
+ETag (hash of the body) and, for single-resource responses, Last-Modified (the object's
+`updated_at`-style field), and answers If-None-Match / If-Modified-Since with 304.
+
+Lists get no Last-Modified: removing an item (a deleted review, an expired story) does
+not move the newest timestamp forward, so If-Modified-Since would wrongly answer 304.
+Their ETag covers the whole body and catches removals.
+
+Public policies use s-maxage so CloudFront can answer repeats without invoking the
+Lambda. GET routes without a policy get `no-store`: with no header at all CloudFront
+would apply its default TTL to user-specific responses.
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional, Tuple
+
+NO_STORE = "no-store"
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    max_age: int = 0
+    # Shared caches (CloudFront) only; defaults to max_age
+    s_maxage: Optional[int] = None
+    stale_while_revalidate: Optional[int] = None
+    stale_if_error: Optional[int] = None
+    # User-specific: only the device may cache, never the edge
+    private: bool = False
+    # Query parameters that make an otherwise public response user-specific
+    private_params: Tuple[str, ...] = ()
+    # Body fields holding the resource's timestamp, first present wins; JSON objects only
+    last_modified: Tuple[str, ...] = ()
+
+    def is_private(self, query_string: bytes = b"") -> bool:
+        if self.private:
+            return True
+        if not self.private_params or not query_string:
+            return False
+        sent = parse_qs(query_string.decode("latin-1"))
+        return any(param in sent for param in self.private_params)
+
+    def header_value(self, private: Optional[bool] = None) -> str:
+        if self.private if private is None else private:
+            # Always revalidate; the ETag makes that a bodiless 304 when nothing changed
+            parts = ["private", f"max-age={self.max_age}" if self.max_age else "no-cache"]
+        else:
+            parts = ["public", f"max-age={self.max_age}"]
+            if self.s_maxage is not None:
+                parts.append(f"s-maxage={self.s_maxage}")
+        if self.stale_while_revalidate:
+            parts.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        if self.stale_if_error:
+            parts.append(f"stale-if-error={self.stale_if_error}")
+        return ", ".join(parts)
+
+
+# Cafe profiles, reviews and occupancy history change rarely
+PUBLIC_PROFILE = CachePolicy(max_age=60, s_maxage=120, stale_while_revalidate=600, stale_if_error=3600,
+                             last_modified=("updated_at", "created_at"))
+# Anything showing live occupancy or active stories; clients poll these every 30s
+PUBLIC_LIVE = CachePolicy(max_age=15, s_maxage=30, stale_while_revalidate=30, stale_if_error=600,
+                          last_modified=("updated_at", "created_at"))
+PRIVATE = CachePolicy(private=True, last_modified=("updated_at", "created_at"))
+
+
+def cache_policy(policy: CachePolicy) -> Callable:
+    """Attach a caching policy to an endpoint; place it below the route decorator."""
+    def decorator(fn):
+        fn.cache_policy = policy
+        return fn
+    return decorator
+
+
+def make_etag(body: bytes) -> str:
+    # Weak: CloudFront may compress the body on the way out
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def last_modified_of(body: bytes, fields: Tuple[str, ...]) -> Optional[datetime]:
+    """The first present `fields` timestamp of a JSON object; None for lists and anything else."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    for field in fields:
+        ts = _parse_timestamp(data.get(field))
+        if ts is not None:
+            return ts
+    return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): ignore the W/ prefix on both sides
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole-second precision
+    return last_modified.replace(microsecond=0) <= since
+
+
+class HTTPCacheMiddleware:
+    """Pure ASGI middleware applying each endpoint's CachePolicy to GET/HEAD responses."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts = []
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Routing has run by now, so the matched endpoint is in the scope
+                policy = getattr(scope.get("endpoint"), "cache_policy", None)
+                if policy is None or message["status"] != 200:
+                    headers = list(message.get("headers", []))
+                    if not any(name.lower() == b"cache-control" for name, _ in headers):
+                        headers.append((b"cache-control", NO_STORE.encode()))
+                    await send({**message, "headers": headers})
+                    return
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            # Buffer the (small, JSON) body: the ETag needs all of it
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._finish(scope, send, start_message, b"".join(body_parts))
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _finish(self, scope, send, start_message, body: bytes) -> None:
+        policy: CachePolicy = scope["endpoint"].cache_policy
+        request_headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        etag = make_etag(body)
+        last_modified = last_modified_of(body, policy.last_modified) if policy.last_modified else None
+
+        headers = [
+            (name, value) for name, value in start_message.get("headers", [])
+            if name.lower() not in (b"cache-control", b"etag", b"last-modified")
+        ]
+        private = policy.is_private(scope.get("query_string", b""))
+        headers.append((b"cache-control", policy.header_value(private).encode()))
+        headers.append((b"etag", etag.encode()))
+        if last_modified is not None:
+            headers.append((b"last-modified", format_datetime(last_modified.astimezone(timezone.utc), usegmt=True).encode()))
+        if not any(name.lower() == b"vary" for name, _ in headers):
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        # If-None-Match wins over If-Modified-Since when both are sent
+        if_none_match = request_headers.get("if-none-match")
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_none_match is not None:
+            not_modified = _etag_matches(if_none_match, etag)
+        else:
+            not_modified = bool(if_modified_since and last_modified and _not_modified_since(if_modified_since, last_modified))
+
+        if not_modified:
+            headers = [(n, v) for n, v in headers if n.lower() not in (b"content-length", b"content-type")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
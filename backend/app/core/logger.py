@@ -1,78 +1,238 @@
+# backend/app/core/logger.py
+"""
+Application logging.
+
+Request code only enqueues records: a QueueHandler on the "app" logger hands them to a
+QueueListener thread, which formats, redacts and writes them to stdout. On Lambda,
+call flush_logs() before returning from the handler so nothing is left in the queue
+while the instance is frozen.
+
+LOG_FORMAT:
+  json - one JSON object per line (time, level, logger, request_id, message, location,
+         exception and any `extra=` fields); queryable in CloudWatch Logs Insights. Default.
+  text - the old "[time] LEVEL [logger] [request_id] message" line, for local development
+LOG_LEVEL: defaults to INFO
+LOG_QUEUE=0 writes from the calling thread instead (debugging, or a process that exits
+without flushing)
+
+metrics_logger ("app.emf") carries pre-built CloudWatch EMF lines through the same queue
+and writes them verbatim, so they never interleave with (or get wrapped like) log lines.
+
+Redaction is one precompiled regex pass over each message and traceback. It masks
+credentials (password/secret/token/api_key/authorization/cookie values, bearer tokens,
+JWTs, AWS access key ids, passwords in connection URLs) and coordinates (lat/lng values,
+and bare "lat, lng" pairs in range with at least four decimals and no unit, so timings
+like "1.234, 2.345 ms" survive). A sensitive key may be followed by ":", "=" or, when the value
+contains a digit, just whitespace ("lat 42.36012"). `extra=` fields with a sensitive name
+are masked whole.
+"""
+import atexit
+import json
 import logging
+import os
+import queue
+import re
 import sys
-import time
 from contextvars import ContextVar
-from starlette.middleware.base import BaseHTTPMiddleware
-import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1").lower() in ("1", "true", "yes")
+
+MASK = "***"
+
+METRICS_LOGGER_NAME = "app.emf"
+
 # Request ID traceability
 request_id_ctx_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
 
-class LogRedactor(logging.Filter):
-    REDACT_KEYS = {"password", "token", "authorization", "cookie", "latitude", "longitude"}
-    
+
+class LogRedactor:
+    SENSITIVE_KEYS = (
+        "password", "passwd", "secret", "token", "api_key", "apikey", "authorization",
+        "cookie", "set-cookie", "latitude", "longitude", "lat", "lng",
+    )
+
+    _KEYS = r"(?<![A-Za-z])(?:" + "|".join(re.escape(k) for k in SENSITIVE_KEYS) + r")"
+    _LAT = r"-?(?:[1-8]?\d\.\d{4,}|90\.0{4,})"
+    _LNG = r"-?(?:1[0-7]\d\.\d{4,}|[1-9]?\d\.\d{4,}|180\.0{4,})"
+
+    # Each alternative is a named group; _replace keeps the key / prefix and masks the rest.
+    # Keys may be quoted, including the escaped quotes of JSON embedded in a message.
+    PATTERN = re.compile(
+        r"(?P<key>" + _KEYS + r"(?:\\?[\"'])?\s*[:=]\s*)"
+        r"(?P<value>\"[^\"]*\"|'[^']*'|\\\"(?:[^\"\\]|\\[^\"])*\\\""
+        r"|(?:(?:Bearer|Basic)\s+)?[^\s\"'\\,&;})\]]+)"
+        r"|(?P<bearer>\b(?:Bearer|Basic)\s+)[A-Za-z0-9._~+/=-]+"
+        r"|(?P<jwt>\beyJ[A-Za-z0-9_-]{5,}\.[A-Za-z0-9_-]{5,}\.[A-Za-z0-9_-]*)"
+        r"|(?P<aws_key>\b(?:AKIA|ASIA)[0-9A-Z]{16}\b)"
+        r"|(?P<url>://[^\s/:@]+:)[^\s/@]+@"
+        # "lat 42.36012": whitespace only counts as a separator before something numeric,
+        # so prose such as "token expired" is left alone
+        r"|(?P<spaced_key>" + _KEYS + r"\s+)(?=[^\s\"'\\,&;})\]]*\d)[^\s\"'\\,&;})\]]+"
+        r"|(?P<coords>(?<![\d.])" + _LAT + r"\s*,\s*" + _LNG + r"(?![\d.])(?!\s*(?:ms|s|%)(?![A-Za-z])))",
+        re.IGNORECASE,
+    )
+
+    @staticmethod
+    def _replace(match: re.Match) -> str:
+        kind = match.lastgroup
+        if kind == "value":
+            # Keep the value's quoting so JSON inside a message stays well-formed
+            value = match.group("value")
+            quote = value[:2] if value.startswith("\\") else value[0] if value[0] in "\"'" else ""
+            return match.group("key") + quote + MASK + quote
+        if kind == "bearer":
+            return match.group("bearer") + MASK
+        if kind == "spaced_key":
+            return match.group("spaced_key") + MASK
+        if kind == "url":
+            return match.group("url") + MASK + "@"
+        return MASK
+
+    def redact(self, text: str) -> str:
+        return self.PATTERN.sub(self._replace, text)
+
+    def redact_field(self, key: str, value):
+        if key.lower() in self.SENSITIVE_KEYS:
+            return MASK
+        return self.redact(value) if isinstance(value, str) else value
+
+
+redactor = LogRedactor()
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Runs on the calling thread, where the request's context variables are visible."""
+
     def filter(self, record):
-        if hasattr(record, "msg") and isinstance(record.msg, str):
-            # Simple string redaction for common patterns
-            for key in self.REDACT_KEYS:
-                if key in record.msg.lower():
-                    # This is a very basic redactor; in a real app, use regex or JSON parsing
-                    pass 
+        record.request_id = request_id_ctx_var.get()
         return True
 
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": redactor.redact(record.getMessage()),
+            "location": f"{record.module}:{record.funcName}:{record.lineno}",
+        }
+        if record.exc_info:
+            entry["exception"] = redactor.redact(self.formatException(record.exc_info))
+        if record.stack_info:
+            entry["stack"] = redactor.redact(self.formatStack(record.stack_info))
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in entry:
+                entry[key] = redactor.redact_field(key, value)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        record.request_id = getattr(record, "request_id", None) or "no-request-id"
+        return redactor.redact(super().format(record))
+
+
+class NotMetricsFilter(logging.Filter):
+    """Keeps EMF lines out of the formatted log output."""
+
+    def filter(self, record):
+        return record.name != METRICS_LOGGER_NAME
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    Enqueue without formatting. The stock prepare() formats the whole record (traceback
+    included) on the calling thread; here only %-args are merged, since the objects they
+    refer to may change once the call returns. Formatting and redaction happen on the
+    listener thread.
+    """
+
+    def prepare(self, record):
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+_queue: Optional[queue.Queue] = None
+_listener: Optional[QueueListener] = None
+
+
+def flush_logs() -> None:
+    """Block until every queued record has been written."""
+    if _queue is not None and _listener is not None:
+        _queue.join()
+    sys.stdout.flush()
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
 def setup_logging():
+    global _queue, _listener
     logger = logging.getLogger("app")
-    logger.setLevel(logging.INFO)
-    
-    # Remove existing handlers to avoid duplicates
-    if logger.handlers:
-        logger.handlers.clear()
-        
-    handler = logging.StreamHandler(sys.stdout)
-    
-    # Custom formatter that includes request_id
-    class RequestIdFormatter(logging.Formatter):
-        def format(self, record):
-            record.request_id = request_id_ctx_var.get() or "no-request-id"
-            return super().format(record)
-
-    formatter = RequestIdFormatter(
-        '[%(asctime)s] %(levelname)s [%(name)s] [%(request_id)s] %(message)s',
-        datefmt='%H:%M:%S'
-    )
-    
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    logger.addFilter(LogRedactor())
-    
-    # Prevent propagation to root logger to avoid double logging
+    logger.setLevel(LOG_LEVEL)
+    metrics_logger = logging.getLogger(METRICS_LOGGER_NAME)
+    metrics_logger.setLevel(logging.INFO)
+
+    # Remove existing handlers (and a previous listener) to avoid duplicates
+    _stop_listener()
+    for existing in (logger, metrics_logger):
+        existing.handlers.clear()
+        existing.filters.clear()
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        output.setFormatter(TextFormatter(
+            '[%(asctime)s] %(levelname)s [%(name)s] [%(request_id)s] %(message)s',
+            datefmt='%H:%M:%S'
+        ))
+    else:
+        output.setFormatter(JsonFormatter())
+    output.addFilter(NotMetricsFilter())
+
+    # EMF lines are already JSON; written as-is
+    metrics_output = logging.StreamHandler(sys.stdout)
+    metrics_output.setFormatter(logging.Formatter("%(message)s"))
+    metrics_output.addFilter(logging.Filter(METRICS_LOGGER_NAME))
+
+    if LOG_QUEUE:
+        # queue.Queue rather than SimpleQueue: the listener calls task_done(), which is
+        # what lets flush_logs() wait for the queue to drain
+        _queue = queue.Queue()
+        _listener = QueueListener(_queue, output, metrics_output, respect_handler_level=True)
+        _listener.start()
+        logger.addHandler(RequestQueueHandler(_queue))
+        metrics_logger.addHandler(RequestQueueHandler(_queue))
+    else:
+        _queue = None
+        logger.addHandler(output)
+        metrics_logger.addHandler(metrics_output)
+    logger.addFilter(RequestIdFilter())
+
+    # Prevent propagation to root logger to avoid double logging; EMF lines must not
+    # reach the "app" handlers either
     logger.propagate = False
+    metrics_logger.propagate = False
     return logger
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        request_id = str(uuid.uuid4())
-        token = request_id_ctx_var.set(request_id)
-        start_time = time.time()
-        
-        logger = logging.getLogger("app")
-        
-        try:
-            response = await call_next(request)
-            duration = time.time() - start_time
-            
-            logger.info(
-                f"{request.method} {request.url.path} {response.status_code} ({duration:.2f}s)"
-            )
-            
-            return response
-        except Exception as e:
-            duration = time.time() - start_time
-            logger.error(f"{request.method} {request.url.path} Failed: {str(e)} ({duration:.2f}s)")
-            raise e
-        finally:
-            request_id_ctx_var.reset(token)
+
+atexit.register(_stop_listener)
 
 # Initialize on import
 app_logger = setup_logging()
+metrics_logger = logging.getLogger(METRICS_LOGGER_NAME)
@@ -0,0 +1,192 @@
+# backend/app/core/metrics.py
+"""
+Request instrumentation.
+
+RequestMetricsMiddleware is pure ASGI (no BaseHTTPMiddleware task and stream wrapping). Per
+request it sets the request id used in log lines, times the request on the monotonic
+clock, and records:
+- latency histogram per method and route template
+- status counts per route
+- response size histogram per route
+- requests in flight
+
+Route labels are templates ("/cafes/{cafe_id}"), never raw paths, to keep cardinality bounded.
+
+METRICS_EXPORT:
+  prometheus - served at GET /metrics (default outside Lambda)
+  emf        - one CloudWatch Embedded Metric Format line per request on stdout, written by
+               the logging queue's listener thread (see app.core.logger). CloudWatch derives
+               the metrics from it, p95/p99 included. Default on Lambda, where each instance
+               only sees its own requests and cannot be scraped.
+  both
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+from app.core.logger import app_logger as logger, metrics_logger, request_id_ctx_var
+
+METRICS_EXPORT = os.getenv("METRICS_EXPORT") or ("emf" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "prometheus")
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "Nook/API")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense; not thread-safe on its own."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        out = []
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            out.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return out
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[Tuple[str, str], Histogram] = {}
+        self.statuses: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight = 0
+
+    def start(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self, method: str, route: str, status: int, seconds: float, size: int) -> None:
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.sizes[key] = Histogram(SIZE_BUCKETS)
+            self.latency[key].observe(seconds)
+            self.sizes[key].observe(size)
+            self.statuses[(method, route, status)] = self.statuses.get((method, route, status), 0) + 1
+
+    def render_prometheus(self) -> str:
+        """Text exposition format 0.0.4."""
+        lines = []
+
+        def histogram(name: str, help_text: str, series: Dict[Tuple[str, str], Histogram]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), h in sorted(series.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                for le, n in h.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {n}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        with self._lock:
+            histogram("http_request_duration_seconds", "Request latency by route.", self.latency)
+            histogram("http_response_size_bytes", "Response body size by route.", self.sizes)
+            lines.append("# HELP http_requests_total Requests by route and status code.")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), n in sorted(self.statuses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {n}')
+            lines.append("# HELP http_requests_in_flight Requests currently being served.")
+            lines.append("# TYPE http_requests_in_flight gauge")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def emf_record(method: str, route: str, status: int, seconds: float, size: int, request_id: str) -> str:
+    """One request as a CloudWatch Embedded Metric Format log line."""
+    return json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["route", "method"]],
+                "Metrics": [
+                    {"Name": "latency", "Unit": "Milliseconds"},
+                    {"Name": "response_bytes", "Unit": "Bytes"},
+                    {"Name": "server_errors", "Unit": "Count"},
+                ],
+            }],
+        },
+        "route": route,
+        "method": method,
+        # Properties rather than dimensions: searchable in Logs Insights, no extra metric streams
+        "status": status,
+        "request_id": request_id,
+        "latency": round(seconds * 1000, 3),
+        "response_bytes": size,
+        "server_errors": 1 if status >= 500 else 0,
+    })
+
+
+metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI request logging and metrics; replaces the old BaseHTTPMiddleware logger."""
+
+    def __init__(self, app, export: str = METRICS_EXPORT):
+        self.app = app
+        self.emf = export in ("emf", "both")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = str(uuid.uuid4())
+        token = request_id_ctx_var.set(request_id)
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.start()
+        failed = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            failed = True
+            status = 500
+            logger.error(f"{scope['method']} {scope['path']} Failed: {str(e)} ({time.perf_counter() - start:.2f}s)")
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            metrics.finish(scope["method"], route, status, duration, size)
+            if self.emf:
+                # Through the logging queue: written by the listener thread, after the response
+                metrics_logger.info(emf_record(scope["method"], route, status, duration, size, request_id))
+            if not failed:
+                logger.info(f"{scope['method']} {scope['path']} {status} ({duration:.2f}s)")
+            request_id_ctx_var.reset(token)
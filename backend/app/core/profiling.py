@@ -0,0 +1,250 @@
+# backend/app/core/profiling.py
+"""
+On-demand request profiling.
+
+A request is profiled when:
+- it sends `X-Profile: <PROFILE_TOKEN>` (ignored unless PROFILE_TOKEN is set), or
+- it falls in the PROFILE_SAMPLE_RATE fraction of requests, or
+- PROFILE_SLOW_MS is set: every request is sampled and the capture kept only if the
+  request took longer than that (about 1% CPU at the default 10ms interval)
+
+While profiled, a sampling thread records every PROFILE_INTERVAL_MS the Python stack of
+each busy thread. That covers the event loop, the threadpool running sync endpoints and
+its DB waits, so time splits into serialization, ORM hydration and I/O. Samples go to
+every capture active at that moment, which is exact on Lambda (one request per instance)
+and approximate under concurrency. With PROFILE_TRACEMALLOC=1, explicitly requested and
+sampled captures also record the top allocation sites (tracemalloc slows the request
+down noticeably).
+
+Each capture writes <request_id>.folded (collapsed stacks for flamegraph.pl, speedscope or
+inferno) and <request_id>.json (request, timing, top allocations) to PROFILE_OUTPUT_DIR,
+or to s3://PROFILE_BUCKET/profiles/ when set. PROFILE_S3_ENDPOINT_URL points that at a
+local stand-in such as MinIO or moto_server.
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import app_logger as logger, request_id_ctx_var
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "").lower() in ("1", "true", "yes")
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "/tmp/profiles")
+PROFILE_BUCKET = os.getenv("PROFILE_BUCKET")
+PROFILE_S3_ENDPOINT_URL = os.getenv("PROFILE_S3_ENDPOINT_URL")
+
+PROFILE_HEADER = b"x-profile"
+
+# Leaf frames of parked threads (idle pool workers). The event loop waiting in select() is
+# kept: for async endpoints that is the time spent waiting on the database or S3.
+_IDLE_LEAVES = {("threading.py", "wait"), ("queue.py", "get")}
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace("\\", "/").split("/")
+    return f"{'/'.join(path[-2:])}:{code.co_name}"
+
+
+class Capture:
+    def __init__(self, request_id: str, reason: str, memory: bool):
+        self.request_id = request_id
+        self.reason = reason
+        self.memory = memory
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = datetime.now(timezone.utc)
+        self.memory_before = None
+
+
+class StackSampler:
+    """One background thread serving every active capture; runs only while there is one."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._captures: List[Capture] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, capture: Capture) -> None:
+        with self._lock:
+            self._captures.append(capture)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, capture: Capture) -> None:
+        with self._lock:
+            self._captures.remove(capture)
+
+    def _sample(self) -> Dict[str, int]:
+        own = threading.get_ident()
+        stacks: Dict[str, int] = {}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            code = frame.f_code
+            if (code.co_filename.replace("\\", "/").rsplit("/", 1)[-1], code.co_name) in _IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = ";".join(reversed(labels))
+            stacks[stack] = stacks.get(stack, 0) + 1
+        return stacks
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._captures:
+                    self._thread = None
+                    return
+                captures = list(self._captures)
+            stacks = self._sample()
+            # Under the lock, and only for captures still registered: once remove() returns,
+            # the middleware reads the counters without this thread changing them
+            with self._lock:
+                for capture in captures:
+                    if capture in self._captures:
+                        capture.samples += 1
+                        capture.stacks.update(stacks)
+            time.sleep(self.interval)
+
+
+sampler = StackSampler(PROFILE_INTERVAL_MS / 1000)
+
+# tracemalloc is process-wide; only the first capture starts it and the last one stops it
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def _start_memory(capture: Capture) -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _tracemalloc_users += 1
+    capture.memory_before = tracemalloc.take_snapshot()
+
+
+def _stop_memory(capture: Capture) -> List[dict]:
+    global _tracemalloc_users
+    after = tracemalloc.take_snapshot()
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+    top = after.compare_to(capture.memory_before, "lineno")[:PROFILE_TOP_ALLOCATIONS]
+    return [
+        {"site": str(stat.traceback[0]), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff}
+        for stat in top
+    ]
+
+
+@lru_cache(maxsize=1)
+def _s3():
+    import boto3  # only needed when PROFILE_BUCKET is set
+    return boto3.client("s3", endpoint_url=PROFILE_S3_ENDPOINT_URL)
+
+
+def write_capture(request_id: str, folded: str, meta: dict) -> str:
+    """Store both files; returns where they went."""
+    meta_json = json.dumps(meta, indent=2, default=str)
+    if PROFILE_BUCKET:
+        prefix = f"profiles/{meta['started_at'][:10]}/{request_id}"
+        _s3().put_object(Bucket=PROFILE_BUCKET, Key=f"{prefix}.folded", Body=folded.encode(), ContentType="text/plain")
+        _s3().put_object(Bucket=PROFILE_BUCKET, Key=f"{prefix}.json", Body=meta_json.encode(), ContentType="application/json")
+        return f"s3://{PROFILE_BUCKET}/{prefix}"
+    os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_OUTPUT_DIR, request_id)
+    with open(base + ".folded", "w") as f:
+        f.write(folded)
+    with open(base + ".json", "w") as f:
+        f.write(meta_json)
+    return base
+
+
+def _token_matches(scope) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER:
+            return hmac.compare_digest(value, PROFILE_TOKEN.encode())
+    return False
+
+
+class ProfilingMiddleware:
+    """Pure ASGI; requests that are not profiled pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _reason(self, scope) -> Optional[str]:
+        if _token_matches(scope):
+            return "header"
+        if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+            return "sampled"
+        if PROFILE_SLOW_MS:
+            return "slow"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        reason = self._reason(scope) if scope["type"] == "http" else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = request_id_ctx_var.get() or os.urandom(8).hex()
+        capture = Capture(request_id, reason, memory=PROFILE_TRACEMALLOC and reason != "slow")
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        if capture.memory:
+            _start_memory(capture)
+        sampler.add(capture)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            sampler.remove(capture)
+            allocations = _stop_memory(capture) if capture.memory else None
+
+            if reason != "slow" or duration * 1000 >= PROFILE_SLOW_MS:
+                folded = "\n".join(f"{stack} {count}" for stack, count in capture.stacks.most_common()) + "\n"
+                meta = {
+                    "request_id": request_id,
+                    "reason": reason,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(scope.get("route"), "path", None),
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                    "started_at": capture.started_at.isoformat(),
+                    "interval_ms": PROFILE_INTERVAL_MS,
+                    "samples": capture.samples,
+                    "top_allocations": allocations,
+                }
+                try:
+                    location = await run_in_threadpool(write_capture, request_id, folded, meta)
+                    logger.info(f"Profile ({reason}, {duration * 1000:.0f}ms, {capture.samples} samples) written to {location}")
+                except Exception as e:
+                    logger.warning(f"Writing profile failed: {str(e)}")
@@ -0,0 +1,60 @@
+# backend/app/core/startup.py
+import importlib
+import os
+import threading
+from typing import Dict, Tuple
+from fastapi import FastAPI
+
+# STARTUP_MODE:
+#   cold_start - keep import time minimal: no schema DDL, and each router module is imported
+#                by the first request under its prefix. Default on Lambda, where the import
+#                runs inside the first user-facing request after a cold start.
+#   eager      - import every router up front and create missing tables on startup. Default elsewhere.
+STARTUP_MODE = os.getenv("STARTUP_MODE") or ("cold_start" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "eager")
+
+# Paths that describe the whole API and therefore need every router loaded
+_FULL_API_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+class DeferredRouterMiddleware:
+    """
+    Pure ASGI middleware that includes a router into the app the first time a request
+    arrives under its prefix. `routers` maps prefix -> (module path, router attribute).
+    """
+
+    def __init__(self, app, fastapi_app: FastAPI, routers: Dict[str, Tuple[str, str]]):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.pending = dict(routers)
+        self._lock = threading.Lock()
+
+    def _load(self, prefix: str) -> None:
+        with self._lock:
+            target = self.pending.pop(prefix, None)
+            if target is None:
+                return  # another request loaded it meanwhile
+            module_path, attr = target
+            module = importlib.import_module(module_path)
+            self.fastapi_app.include_router(getattr(module, attr))
+            # The cached OpenAPI document no longer covers every route
+            self.fastapi_app.openapi_schema = None
+
+    def _prefixes_for(self, path: str):
+        if path in _FULL_API_PATHS:
+            return list(self.pending)
+        return [p for p in self.pending if path == p or path.startswith(p + "/")]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and self.pending:
+            for prefix in self._prefixes_for(scope["path"]):
+                self._load(prefix)
+        await self.app(scope, receive, send)
+
+
+def include_routers(app: FastAPI, routers: Dict[str, Tuple[str, str]]) -> None:
+    """Register routers now (eager) or on first use (cold_start)."""
+    if STARTUP_MODE == "cold_start":
+        app.add_middleware(DeferredRouterMiddleware, fastapi_app=app, routers=routers)
+        return
+    for module_path, attr in routers.values():
+        app.include_router(getattr(importlib.import_module(module_path), attr))
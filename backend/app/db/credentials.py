@@ -0,0 +1,169 @@
+# backend/app/db/credentials.py
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional, TypeVar
+from sqlalchemy import event
+from app.core.logger import app_logger as logger
+
+T = TypeVar("T")
+
+# How long a fetched secret is trusted, and how long before expiry a background refresh starts
+SECRET_TTL_SECONDS = float(os.getenv("DB_SECRET_TTL_SECONDS", "900"))
+SECRET_REFRESH_AHEAD_SECONDS = float(os.getenv("DB_SECRET_REFRESH_AHEAD_SECONDS", "120"))
+# Points the provider at a local Secrets Manager stand-in (e.g. LocalStack or moto_server)
+SECRETS_MANAGER_ENDPOINT_URL = os.getenv("SECRETS_MANAGER_ENDPOINT_URL")
+
+# invalid_password / invalid_authorization_specification
+_AUTH_SQLSTATES = {"28P01", "28000"}
+
+
+@dataclass
+class DBCredentials:
+    username: Optional[str]
+    password: str
+
+
+def is_auth_failure(exc: BaseException) -> bool:
+    """True for a login rejected by the server (psycopg2 and asyncpg report it differently)."""
+    code = getattr(exc, "sqlstate", None) or getattr(exc, "pgcode", None)
+    if code in _AUTH_SQLSTATES:
+        return True
+    return "password authentication failed" in str(exc)
+
+
+class SecretsCredentialProvider:
+    """
+    Database credentials from Secrets Manager with a TTL cache.
+    Reads are served from memory; shortly before the TTL runs out one background thread
+    refetches, and an authentication failure forces a refetch (the secret was rotated).
+    """
+
+    def __init__(self, secret_id: str, ttl: float = SECRET_TTL_SECONDS,
+                 refresh_ahead: float = SECRET_REFRESH_AHEAD_SECONDS,
+                 endpoint_url: Optional[str] = SECRETS_MANAGER_ENDPOINT_URL,
+                 fetcher: Optional[Callable[[], DBCredentials]] = None):
+        self.secret_id = secret_id
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.endpoint_url = endpoint_url
+        self._fetcher = fetcher or self._fetch_from_secrets_manager
+        self._lock = threading.Lock()
+        self._first_fetch_lock = threading.Lock()
+        self._refreshing = False
+        self._credentials: Optional[DBCredentials] = None
+        self._fetched_at: Optional[float] = None
+        self._client = None
+
+    def _fetch_from_secrets_manager(self) -> DBCredentials:
+        if self._client is None:
+            import boto3  # deferred: botocore is slow to import and local dev never needs it
+            self._client = boto3.client("secretsmanager", endpoint_url=self.endpoint_url)
+        resp = self._client.get_secret_value(SecretId=self.secret_id)
+        secret_str = resp.get("SecretString")
+        if not secret_str:
+            raise RuntimeError("SecretString empty for DB secret")
+        data = json.loads(secret_str)
+        return DBCredentials(data.get("username"), data["password"])
+
+    def _store(self, credentials: DBCredentials) -> DBCredentials:
+        with self._lock:
+            self._credentials = credentials
+            self._fetched_at = time.monotonic()
+        return credentials
+
+    def refresh(self) -> DBCredentials:
+        """Fetch now, bypassing the cache."""
+        return self._store(self._fetcher())
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Background DB secret refresh failed, keeping cached value: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="db-secret-refresh", daemon=True).start()
+
+    def get(self) -> DBCredentials:
+        with self._lock:
+            credentials, fetched_at = self._credentials, self._fetched_at
+        if credentials is None:
+            # Only one caller fetches on a cold cache (e.g. the prefetch thread); others wait for it
+            with self._first_fetch_lock:
+                if self._credentials is None:
+                    return self.refresh()
+                return self._credentials
+
+        age = time.monotonic() - fetched_at
+        if age < self.ttl - self.refresh_ahead:
+            return credentials
+        if age < self.ttl:
+            self._refresh_in_background()
+            return credentials
+        try:
+            return self.refresh()
+        except Exception as e:
+            # An expired cache entry is still the best guess; auth failures force a refetch anyway
+            logger.warning(f"DB secret refresh failed, using cached value: {str(e)}")
+            return credentials
+
+    def call_with_retry(self, fn: Callable[[DBCredentials], T]) -> T:
+        """Run fn(credentials); on an authentication failure refetch the secret and try once more."""
+        try:
+            return fn(self.get())
+        except Exception as e:
+            if not is_auth_failure(e):
+                raise
+            logger.warning("DB authentication failed, refetching rotated secret")
+            return fn(self.refresh())
+
+
+def attach_credential_provider(engine, provider: SecretsCredentialProvider) -> None:
+    """Inject the current password into every new connection (sync engines or async_engine.sync_engine)."""
+
+    @event.listens_for(engine, "do_connect")
+    def _provide_credentials(dialect, conn_rec, cargs, cparams):
+        def _connect(credentials: DBCredentials):
+            params = dict(cparams, password=credentials.password)
+            if credentials.username:
+                params["user"] = credentials.username
+            return dialect.connect(*cargs, **params)
+
+        # Returning a connection tells SQLAlchemy to use it instead of connecting itself
+        return provider.call_with_retry(_connect)
+
+
+@lru_cache(maxsize=1)
+def get_credential_provider() -> Optional[SecretsCredentialProvider]:
+    """The process-wide provider, or None when credentials come from DATABASE_URL."""
+    secret_arn = os.getenv("DB_SECRET_ARN")
+    if os.getenv("DATABASE_URL") or not secret_arn:
+        return None
+    return SecretsCredentialProvider(secret_arn)
+
+
+def prefetch_credentials() -> None:
+    """Start fetching the secret in the background so it overlaps with the rest of the cold start."""
+    provider = get_credential_provider()
+    if provider is None:
+        return
+
+    def _run():
+        try:
+            provider.get()
+        except Exception as e:
+            logger.warning(f"DB secret prefetch failed: {str(e)}")
+
+    threading.Thread(target=_run, name="db-secret-prefetch", daemon=True).start()
@@ -1,11 +1,50 @@
 # backend/app/db/deps.py
-from typing import Generator
-from app.db.session import SessionLocal
+from typing import AsyncGenerator, Awaitable, Callable, Generator, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.db.session import SessionLocal, AsyncSessionLocal, get_engine, get_async_engine, get_replica_router
+
+T = TypeVar("T")
 
 def get_db() -> Generator:
     """Dependency to yield a database session."""
-    db = SessionLocal()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to yield an async database session (for async def handlers)."""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+# Read-only endpoints depend on these instead; they use the replica when it is healthy
+# and within lag tolerance, the primary otherwise. Never use them for writes.
+def get_read_db() -> Generator:
+    """Dependency to yield a read-only database session."""
+    db = SessionLocal(bind=get_replica_router().read_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to yield a read-only async database session."""
+    async with AsyncSessionLocal(bind=await get_replica_router().read_async_engine()) as db:
+        yield db
+
+async def run_with_session(fn: Callable[..., T], *args) -> T:
+    """Run fn(db, *args) in the threadpool on its own session so independent queries can be gathered."""
+    def _run() -> T:
+        db = SessionLocal(bind=get_engine())
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return await run_in_threadpool(_run)
+
+async def run_with_async_read_session(fn: Callable[..., Awaitable[T]], *args) -> T:
+    """Await fn(db, *args) on its own read-only async session, so independent queries can be gathered."""
+    async with AsyncSessionLocal(bind=await get_replica_router().read_async_engine()) as db:
+        return await fn(db, *args)
@@ -0,0 +1,225 @@
+# backend/app/db/migrate.py
+"""
+Versioned schema migrations.
+
+Scripts live in app/db/migrations as NNNN_description.py and run in version order. Each
+defines `upgrade(ctx)`; applied versions are recorded in `schema_migrations`, so every
+script runs exactly once per database.
+
+Scripts run in a single transaction unless they set `TRANSACTIONAL = False`. That is
+required for CREATE INDEX CONCURRENTLY and batched backfills, which must commit as they
+go; such scripts have to be safe to re-run after a partial failure.
+
+    cd backend && python -m app.db.migrate [--status]
+"""
+import importlib
+import pkgutil
+import re
+import time
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Sequence
+from app.core.logger import app_logger as logger
+
+MIGRATIONS_PACKAGE = "app.db.migrations"
+HISTORY_TABLE = "schema_migrations"
+# Arbitrary constant; serializes concurrent runners (e.g. two deploys) per database
+ADVISORY_LOCK_ID = 7_042_311
+
+_SCRIPT_NAME = re.compile(r"^(\d{4})_(\w+)$")
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    module: ModuleType
+
+    @property
+    def transactional(self) -> bool:
+        return getattr(self.module, "TRANSACTIONAL", True)
+
+
+class MigrationContext:
+    """What a migration script gets: a cursor plus helpers for online schema changes."""
+
+    def __init__(self, conn, log: Callable[[str], None] = logger.info):
+        self.conn = conn
+        self.log = log
+
+    def execute(self, sql: str, params: Optional[dict] = None):
+        self.log(f"Executing: {sql.strip()}")
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.rowcount
+
+    def fetchone(self, sql: str, params: Optional[dict] = None):
+        with self.conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchone()
+
+    def _require_autocommit(self, what: str) -> None:
+        if not self.conn.autocommit:
+            raise RuntimeError(f"{what} needs TRANSACTIONAL = False in the migration script")
+
+    def create_index_concurrently(self, name: str, table: str, columns: Sequence[str],
+                                  include: Sequence[str] = (), where: Optional[str] = None,
+                                  unique: bool = False) -> None:
+        """
+        Build an index without blocking writes. A build that failed half way leaves an
+        INVALID index behind (which IF NOT EXISTS would happily skip), so drop that first.
+        """
+        self._require_autocommit("CREATE INDEX CONCURRENTLY")
+        row = self.fetchone(
+            "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+            "WHERE c.relname = %(name)s AND c.relkind = 'i'",
+            {"name": name},
+        )
+        if row is not None and not row[0]:
+            self.log(f"Dropping invalid index {name} left by an interrupted build")
+            self.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+        sql = (
+            f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+            f'ON "{table}" ({", ".join(columns)})'
+        )
+        if include:
+            sql += f" INCLUDE ({', '.join(include)})"
+        if where:
+            sql += f" WHERE {where}"
+        self.execute(sql)
+
+    def backfill(self, sql: str, batch_size: int = 1000, pause_seconds: float = 0.0,
+                 params: Optional[dict] = None) -> int:
+        """
+        Repeat a bounded UPDATE/DELETE until it touches no rows, committing every batch so
+        locks stay short and the job can resume. `sql` must limit itself to %(batch_size)s
+        rows, e.g. `UPDATE t SET x = ... WHERE id IN (SELECT id FROM t WHERE x IS NULL
+        LIMIT %(batch_size)s)`.
+        """
+        self._require_autocommit("Batched backfills")
+        total = 0
+        while True:
+            with self.conn.cursor() as cur:
+                cur.execute(sql, {**(params or {}), "batch_size": batch_size})
+                affected = cur.rowcount
+            total += affected
+            if affected <= 0:
+                break
+            self.log(f"Backfilled {total} rows")
+            if pause_seconds:
+                time.sleep(pause_seconds)
+        return total
+
+
+def discover() -> List[Migration]:
+    """All migration scripts, in version order."""
+    package = importlib.import_module(MIGRATIONS_PACKAGE)
+    migrations: Dict[str, Migration] = {}
+    for info in pkgutil.iter_modules(package.__path__):
+        match = _SCRIPT_NAME.match(info.name)
+        if not match:
+            continue
+        version, name = match.groups()
+        if version in migrations:
+            raise RuntimeError(f"Duplicate migration version {version}")
+        module = importlib.import_module(f"{MIGRATIONS_PACKAGE}.{info.name}")
+        migrations[version] = Migration(version, name, module)
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def _ensure_history_table(conn) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} (
+                version TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                duration_ms INTEGER NOT NULL
+            )
+        """)
+
+
+def applied_versions(conn) -> set:
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT version FROM {HISTORY_TABLE}")
+        return {row[0] for row in cur.fetchall()}
+
+
+def _record(conn, migration: Migration, duration_ms: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            f"INSERT INTO {HISTORY_TABLE} (version, name, duration_ms) VALUES (%(version)s, %(name)s, %(duration_ms)s)",
+            {"version": migration.version, "name": migration.name, "duration_ms": duration_ms},
+        )
+
+
+def run_migrations(conn, log: Callable[[str], None] = logger.info) -> List[str]:
+    """
+    Apply every pending migration on a psycopg2 connection; returns the versions applied.
+    The connection is left in autocommit mode.
+    """
+    conn.autocommit = True
+    _ensure_history_table(conn)
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_ID,))
+    try:
+        done = applied_versions(conn)
+        applied = []
+        for migration in discover():
+            if migration.version in done:
+                continue
+            log(f"Applying migration {migration.version}_{migration.name}"
+                f"{'' if migration.transactional else ' (non-transactional)'}")
+            start = time.monotonic()
+            ctx = MigrationContext(conn, log)
+            if migration.transactional:
+                conn.autocommit = False
+                try:
+                    migration.module.upgrade(ctx)
+                    _record(conn, migration, int((time.monotonic() - start) * 1000))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+            else:
+                migration.module.upgrade(ctx)
+                _record(conn, migration, int((time.monotonic() - start) * 1000))
+            applied.append(migration.version)
+        return applied
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_ID,))
+
+
+def status(conn) -> List[dict]:
+    conn.autocommit = True
+    _ensure_history_table(conn)
+    done = applied_versions(conn)
+    return [
+        {"version": m.version, "name": m.name, "applied": m.version in done}
+        for m in discover()
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db.session import create_schema, get_engine
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    args = parser.parse_args()
+
+    raw = get_engine().raw_connection()
+    try:
+        if args.status:
+            for row in status(raw.driver_connection):
+                logger.info(f"{row['version']}  {'applied' if row['applied'] else 'pending':8} {row['name']}")
+        else:
+            # New tables first (create_all), then versioned changes to existing ones
+            create_schema()
+            logger.info(f"Applied: {run_migrations(raw.driver_connection) or 'nothing pending'}")
+    finally:
+        raw.close()
@@ -0,0 +1,24 @@
+"""The ad-hoc changes migration_handler.py used to run on every invocation."""
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction
+TRANSACTIONAL = False
+
+
+def upgrade(ctx):
+    # Add cancellation_reason column to reservations table
+    ctx.execute("ALTER TABLE reservations ADD COLUMN IF NOT EXISTS cancellation_reason TEXT")
+
+    # Migrate liveUpdates table (user_id -> user_sub)
+    if ctx.fetchone(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = 'liveUpdates' AND column_name = 'user_id'"
+    ):
+        ctx.execute('ALTER TABLE "liveUpdates" RENAME COLUMN user_id TO user_sub')
+        ctx.execute('ALTER TABLE "liveUpdates" ALTER COLUMN user_sub TYPE TEXT USING user_sub::text')
+
+    # Nearby story feed
+    ctx.create_index_concurrently(
+        "ix_liveupdates_feed", "liveUpdates", ["created_at DESC", "id DESC"],
+        include=["expires_at", "cafe_id"],
+    )
+    ctx.create_index_concurrently("ix_cafes_lat_lng", "cafes", ["latitude", "longitude"])
@@ -0,0 +1,16 @@
+"""Indexes for the hot read paths; names match the __table_args__ in app/db/model.py."""
+
+TRANSACTIONAL = False
+
+
+def upgrade(ctx):
+    # Active stories for a cafe: cafe_id = ? AND expires_at > now()
+    ctx.create_index_concurrently("ix_liveupdates_cafe_expires", "liveUpdates", ["cafe_id", "expires_at"])
+    # A user's own stories
+    ctx.create_index_concurrently("ix_liveupdates_user_sub", "liveUpdates", ["user_sub"])
+    # Today's check-in for (user, cafe), newest first; also serves the per-user check-in list
+    ctx.create_index_concurrently("ix_checkins_user_cafe_created", "checkins", ["user_sub", "cafe_id", "created_at"])
+    # Occupancy history/trend for a cafe over a window
+    ctx.create_index_concurrently("ix_occupancy_history_cafe_created", "occupancy_history", ["cafe_id", "created_at"])
+    # Newest reviews for a cafe
+    ctx.create_index_concurrently("ix_reviews_cafe_created", "reviews", ["cafe_id", "created_at"])
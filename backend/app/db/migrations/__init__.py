@@ -0,0 +1,2 @@
+# Versioned migration scripts, applied in order by app/db/migrate.py.
+# Name new scripts NNNN_description.py with the next free number; never edit an applied one.
@@ -13,7 +13,8 @@ from sqlalchemy import (
     func,
     Boolean,
     Table,
-    ForeignKey
+    ForeignKey,
+    Index
 )
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.dialects.postgresql import UUID, JSONB
@@ -72,6 +73,11 @@ class Cafe(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Bounding-box lookups (nearby cafes, story feed)
+        Index('ix_cafes_lat_lng', latitude, longitude),
+    )
+
 
 # --------------------------- USER MODEL ---------------------------
 class User(Base):
@@ -124,6 +130,19 @@ class LiveUpdates(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     expires_at = Column(DateTime(timezone=True), server_default=func.now() + timedelta(days=1), nullable=False)
 
+    __table_args__ = (
+        # Story feed: newest-first keyset scan; expires_at/cafe_id are included so the
+        # active filter and the cafe join are answered from the index
+        Index(
+            'ix_liveupdates_feed', created_at.desc(), id.desc(),
+            postgresql_include=['expires_at', 'cafe_id']
+        ),
+        # Active stories for a cafe
+        Index('ix_liveupdates_cafe_expires', cafe_id, expires_at),
+        # A user's own stories
+        Index('ix_liveupdates_user_sub', user_sub),
+    )
+
 
 # --------------------------- REVIEWS MODEL ---------------------------
 class Review(Base):
@@ -142,6 +161,11 @@ class Review(Base):
     user = relationship("User", backref="reviews")
     cafe = relationship("Cafe", backref=backref("reviews", cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        # Newest reviews for a cafe
+        Index('ix_reviews_cafe_created', cafe_id, created_at),
+    )
+
 # --------------------------- CHECKIN MODEL ---------------------------
 class Checkin(Base):
     __tablename__ = "checkins"
@@ -154,6 +178,11 @@ class Checkin(Base):
     user = relationship("User", backref="checkins")
     cafe = relationship("Cafe", backref=backref("checkins", cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        # "Checked in here today?" and the review eligibility check
+        Index('ix_checkins_user_cafe_created', user_sub, cafe_id, created_at),
+    )
+
 # --------------------------- OCCUPANCY HISTORY MODEL ---------------------------
 class OccupancyHistory(Base):
     __tablename__ = "occupancy_history"
@@ -171,6 +200,11 @@ class OccupancyHistory(Base):
 
     cafe = relationship("Cafe", backref=backref("occupancy_history", cascade="all, delete-orphan"))
 
+    __table_args__ = (
+        # Occupancy history/trend for a cafe over a time window
+        Index('ix_occupancy_history_cafe_created', cafe_id, created_at),
+    )
+
 # --------------------------- RESERVATION MODEL ---------------------------
 class Reservation(Base):
     __tablename__ = "reservations"
@@ -192,3 +226,31 @@ class Reservation(Base):
 
     user = relationship("User", backref="reservations")
     cafe = relationship("Cafe", backref=backref("reservations", cascade="all, delete-orphan"))
+
+# --------------------------- IMAGE VARIANTS MODEL ---------------------------
+class ImageVariant(Base):
+    __tablename__ = "image_variants"
+
+    # Public URL of the original upload, as stored on cafes / liveUpdates
+    original_url = Column(Text, primary_key=True)
+
+    thumb_url = Column(Text, nullable=True)
+    card_url = Column(Text, nullable=True)
+    full_url = Column(Text, nullable=True)
+    placeholder = Column(Text, nullable=True)  # tiny inline data URI shown while the real image loads
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# --------------------------- CONTENT HASH INDEX ---------------------------
+class ContentHash(Base):
+    __tablename__ = "content_hashes"
+
+    # sha256 of the object bytes (hex); scoped per category so e.g. story cleanup stays local
+    sha256 = Column(String(64), primary_key=True)
+    category = Column(String, primary_key=True)
+
+    url = Column(Text, nullable=False, index=True)
+    size = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,163 @@
+# backend/app/db/pool.py
+import os
+import threading
+import time
+from typing import Any, Dict
+from sqlalchemy import event, exc
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
+
+# DB_POOL_MODE:
+#   lambda - one persistent connection per instance plus a few short-lived overflow ones
+#            (Lambda serves one request at a time; overflow only covers concurrent queries
+#            such as the profile bundle). Default when running on Lambda.
+#   null   - no pooling; every checkout opens a connection. Use behind RDS Proxy.
+#   queue  - bounded QueuePool for long-lived servers/containers. Default elsewhere.
+POOL_MODE = os.getenv("DB_POOL_MODE") or ("lambda" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "queue")
+
+# Instead of pinging on every checkout, only validate connections idle longer than this
+VALIDATE_IDLE_SECONDS = float(os.getenv("DB_POOL_VALIDATE_IDLE_SECONDS", "30"))
+
+
+class PoolMetrics:
+    """Process-wide counters for pool behaviour; cheap enough to update on every checkout."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.idle_validations = 0
+        self.stale_connections = 0
+        self.connection_age_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def record_age(self, seconds: float):
+        with self._lock:
+            self.connection_age_max = max(self.connection_age_max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_wait_seconds_total": round(self.checkout_wait_total, 6),
+                "checkout_wait_seconds_avg": round(self.checkout_wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "checkout_wait_seconds_max": round(self.checkout_wait_max, 6),
+                "connections_opened": self.connections_opened,
+                "connections_closed": self.connections_closed,
+                "idle_validations": self.idle_validations,
+                "stale_connections": self.stale_connections,
+                "connection_age_seconds_max": round(self.connection_age_max, 3),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class _TimedCheckout:
+    """Mixin timing how long a checkout waits on the pool (including opening a connection)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(is_async: bool = False) -> Dict[str, Any]:
+    """Engine keyword arguments for the configured pool mode."""
+    if POOL_MODE == "null":
+        return {"poolclass": NullPool}
+
+    poolclass = InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool
+    if POOL_MODE == "lambda":
+        defaults = {"size": "1", "overflow": "4", "timeout": "5"}
+    else:
+        defaults = {"size": "5", "overflow": "10", "timeout": "30"}
+
+    return {
+        "poolclass": poolclass,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", defaults["size"])),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", defaults["overflow"])),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", defaults["timeout"])),
+        # Retire connections before RDS/NAT idle timeouts can silently kill them
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_use_lifo": True,
+    }
+
+
+def instrument_pool(engine) -> None:
+    """Attach idle-time validation and connection lifecycle metrics to an engine's pool."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        record.info["created_at"] = time.monotonic()
+        pool_metrics.incr("connections_opened")
+
+    @event.listens_for(engine, "close")
+    def _on_close(dbapi_conn, record):
+        created = record.info.get("created_at")
+        if created is not None:
+            pool_metrics.record_age(time.monotonic() - created)
+        pool_metrics.incr("connections_closed")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        last = record.info.get("last_checkin")
+        if last is None or time.monotonic() - last < VALIDATE_IDLE_SECONDS:
+            return
+        pool_metrics.incr("idle_validations")
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            pool_metrics.incr("stale_connections")
+            # The pool discards this connection and retries the checkout with a fresh one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def pool_stats(engine) -> Dict[str, Any]:
+    """Current pool state plus the process-wide counters."""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"mode": POOL_MODE, "pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # Negative while the pool is still filling up to pool_size
+            "overflow": pool.overflow(),
+        })
+    stats.update(pool_metrics.snapshot())
+    return stats
@@ -0,0 +1,76 @@
+# backend/app/db/queries.py
+# Cached statements for the hottest lookups.
+#
+# lambda_stmt() caches the statement construct per call site, and its SQL compilation
+# per dialect, keyed on the lambda's code location. Later calls only re-bind the closure
+# variables as parameters, so there is no expression building, no cache-key walk over the
+# whole statement and no recompilation per request. Works with Session and AsyncSession.
+#
+# On the asyncpg engine these are also server-side prepared statements: asyncpg prepares
+# every statement and keeps it in its per-connection statement cache, so repeat executions
+# skip parsing and planning on the server. psycopg2 has no server-side prepare.
+from datetime import datetime
+from uuid import UUID
+from sqlalchemy import func, lambda_stmt, literal_column, select
+from app.db.model import Cafe, User, LiveUpdates, Checkin, Review, OccupancyHistory
+
+
+def cafe_by_id(cafe_id: UUID):
+    return lambda_stmt(lambda: select(Cafe).where(Cafe.id == cafe_id))
+
+
+def cafe_by_owner(cognito_sub: str):
+    return lambda_stmt(lambda: select(Cafe).where(Cafe.cognito_sub == cognito_sub).limit(1))
+
+
+def user_by_sub(cognito_sub: str):
+    return lambda_stmt(lambda: select(User).where(User.cognito_sub == cognito_sub))
+
+
+def active_stories_for_cafe(cafe_id: UUID, now: datetime):
+    return lambda_stmt(
+        lambda: select(LiveUpdates)
+        .where(LiveUpdates.cafe_id == cafe_id, LiveUpdates.expires_at > now)
+        .order_by(LiveUpdates.created_at.desc())
+    )
+
+
+def latest_checkin_since(user_sub: str, cafe_id: UUID, since: datetime):
+    return lambda_stmt(
+        lambda: select(Checkin)
+        .where(Checkin.user_sub == user_sub, Checkin.cafe_id == cafe_id, Checkin.created_at >= since)
+        .order_by(Checkin.created_at.desc())
+        .limit(1)
+    )
+
+
+def checkin_cafe_ids_since(user_sub: str, since: datetime):
+    return lambda_stmt(
+        lambda: select(Checkin.cafe_id).where(Checkin.user_sub == user_sub, Checkin.created_at >= since)
+    )
+
+
+def latest_reviews_with_usernames(cafe_id: UUID, limit: int):
+    # One join instead of a user lookup per review
+    return lambda_stmt(
+        lambda: select(Review, User.username)
+        .outerjoin(User, User.cognito_sub == Review.user_sub)
+        .where(Review.cafe_id == cafe_id)
+        .order_by(Review.created_at.desc())
+        .limit(limit)
+    )
+
+
+def occupancy_series_since(cafe_id: UUID, since: datetime, bucket_seconds: int):
+    """Average occupancy per bucket_seconds-wide bucket (epoch seconds), oldest first."""
+    return lambda_stmt(
+        lambda: select(
+            (func.floor(func.extract("epoch", OccupancyHistory.created_at) / bucket_seconds) * bucket_seconds).label("bucket"),
+            func.avg(OccupancyHistory.occupancy_level).label("occupancy_level"),
+        )
+        .where(OccupancyHistory.cafe_id == cafe_id, OccupancyHistory.created_at >= since)
+        # By output name: the bucket expression carries a bound parameter, and Postgres would
+        # not treat two separately bound copies of it as the same grouping expression
+        .group_by(literal_column("bucket"))
+        .order_by(literal_column("bucket"))
+    )
@@ -0,0 +1,193 @@
+# backend/app/db/query_stats.py
+"""
+Per-request SQL instrumentation.
+
+instrument_queries(engine) hooks cursor execution. While a request is tracked (see
+QueryStatsMiddleware) every statement adds to that request's query count, DB time and
+rows, and:
+- N+1: the same statement shape running more than DB_N_PLUS_ONE_THRESHOLD times in one
+  request is logged once, with the statement
+- slow queries: statements over DB_SLOW_QUERY_MS are logged with their bound parameters
+  redacted (type and length only); DB_SLOW_QUERY_EXPLAIN=1 adds the EXPLAIN plan
+- budgets: endpoints declare @query_budget(n). Going over it logs a warning, or raises
+  QueryBudgetExceeded when DB_QUERY_BUDGET_ENFORCE=1 (tests/CI), failing the request
+
+Log lines carry the request id from app.core.logger, and the response gets a
+Server-Timing `db` entry.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional
+from sqlalchemy import event
+from app.core.logger import app_logger as logger
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "5"))
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("DB_SLOW_QUERY_EXPLAIN", "").lower() in ("1", "true", "yes")
+QUERY_BUDGET_ENFORCE = os.getenv("DB_QUERY_BUDGET_ENFORCE", "").lower() in ("1", "true", "yes")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """What one request (or one `track_queries` block) did against the database."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.shapes: Counter = Counter()
+        self.n_plus_one: List[str] = []
+        # Sync endpoints may gather queries on several threadpool threads
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float, rows: int) -> None:
+        shape = " ".join(statement.split())
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            self.rows += max(rows, 0)
+            self.shapes[shape] += 1
+            repeated = self.shapes[shape] == N_PLUS_ONE_THRESHOLD + 1
+            if repeated:
+                self.n_plus_one.append(shape)
+        if repeated:
+            logger.warning(
+                f"Possible N+1 in {self.label or 'request'}: statement ran more than "
+                f"{N_PLUS_ONE_THRESHOLD} times: {shape[:500]}"
+            )
+
+    def summary(self) -> str:
+        return f"{self.queries} queries, {self.db_seconds * 1000:.1f}ms, {self.rows} rows"
+
+
+query_stats_ctx_var: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(label: str = "") -> Iterator[QueryStats]:
+    """Collect stats for everything executed inside the block (same task, or threads it spawns)."""
+    stats = QueryStats(label)
+    token = query_stats_ctx_var.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats_ctx_var.reset(token)
+
+
+def query_budget(max_queries: int) -> Callable:
+    """Declare how many statements an endpoint may run; place it below the route decorator."""
+    def decorator(fn):
+        fn.query_budget = max_queries
+        return fn
+    return decorator
+
+
+def check_query_budget(stats: QueryStats, max_queries: int, enforce: bool = QUERY_BUDGET_ENFORCE) -> None:
+    if stats.queries <= max_queries:
+        return
+    message = f"{stats.label or 'Block'} ran {stats.summary()}; budget is {max_queries} queries"
+    if enforce:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _redact(parameters):
+    """Bound parameters reduced to their shape: types and lengths, never values."""
+    def mask(value):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return f"<{type(value).__name__} len={len(value)}>"
+        if isinstance(value, (list, tuple)):
+            return f"<{type(value).__name__} len={len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    if isinstance(parameters, dict):
+        return {key: mask(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        # executemany passes a list of parameter sets
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return [_redact(parameters[0]), f"... {len(parameters)} sets"]
+        return [mask(value) for value in parameters]
+    return mask(parameters)
+
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    """Plan only (no ANALYZE), on a separate raw cursor so no events fire."""
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("EXPLAIN " + statement, parameters)
+            return "\n".join(row[0] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    except Exception as e:
+        return f"EXPLAIN failed: {str(e)}"
+
+
+def instrument_queries(engine) -> None:
+    """Attach the query hooks to a sync Engine (or async_engine.sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = query_stats_ctx_var.get()
+        if stats is not None:
+            stats.record(statement, elapsed, getattr(cursor, "rowcount", 0) or 0)
+
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            plan = _explain(conn, statement, parameters) if SLOW_QUERY_EXPLAIN else None
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f}ms): {' '.join(statement.split())[:1000]} "
+                f"params={_redact(parameters)}" + (f"\n{plan}" if plan else "")
+            )
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI: track each request's queries, check its budget, add a Server-Timing entry."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(f"{scope['method']} {scope['path']}") as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    # Budget and timing are known once the endpoint has returned
+                    budget = getattr(scope.get("endpoint"), "query_budget", None)
+                    if budget is not None:
+                        check_query_budget(stats, budget)
+                    headers = list(message.get("headers", []))
+                    headers.append((
+                        b"server-timing",
+                        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"'.encode(),
+                    ))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+            if stats.n_plus_one or stats.db_seconds * 1000 >= SLOW_QUERY_MS:
+                logger.warning(f"DB for {stats.label}: {stats.summary()}")
@@ -0,0 +1,100 @@
+# backend/app/db/replica.py
+import os
+import time
+import threading
+from typing import Optional
+from sqlalchemy import text
+from app.core.logger import app_logger as logger
+
+# How far behind the primary a replica may be and still serve reads
+MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+# How often replica health/lag is re-checked; requests in between reuse the last answer
+CHECK_INTERVAL_SECONDS = float(os.getenv("DB_REPLICA_CHECK_INTERVAL_SECONDS", "10"))
+
+# Lag is 0 when everything received has been replayed (an idle primary would otherwise make
+# pg_last_xact_replay_timestamp look stale), and 0 for a server that is not a standby at all.
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for read-only sessions: the replica while it is reachable and within
+    the lag tolerance, the primary otherwise. Writes never come through here.
+    """
+
+    def __init__(self, primary, replica=None, async_primary=None, async_replica=None,
+                 max_lag: float = MAX_LAG_SECONDS, check_interval: float = CHECK_INTERVAL_SECONDS):
+        self.primary = primary
+        self.replica = replica
+        self.async_primary = async_primary
+        self.async_replica = async_replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._usable = False
+        self._checked_at: Optional[float] = None
+        self.last_lag: Optional[float] = None
+
+    def _due(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def _claim_check(self) -> bool:
+        """
+        True for the one caller that should probe now. The probe then runs outside the
+        lock, and concurrent requests keep using the last answer instead of waiting on it.
+        """
+        if not self._due():
+            return False
+        with self._lock:
+            if not self._due():
+                return False
+            self._checked_at = time.monotonic()
+            return True
+
+    def _record(self, lag: Optional[float], error: Optional[Exception] = None):
+        usable = error is None and lag is not None and lag <= self.max_lag
+        if usable != self._usable:
+            if usable:
+                logger.info(f"Routing reads to replica (lag {lag:.1f}s)")
+            else:
+                reason = f"error: {error}" if error else f"lag {lag:.1f}s > {self.max_lag}s"
+                logger.warning(f"Routing reads to primary, replica unusable ({reason})")
+        self._usable = usable
+        self.last_lag = lag
+        self._checked_at = time.monotonic()
+
+    def read_engine(self):
+        if self.replica is None:
+            return self.primary
+        if self._claim_check():
+            try:
+                with self.replica.connect() as conn:
+                    self._record(float(conn.execute(LAG_SQL).scalar()))
+            except Exception as e:
+                self._record(None, e)
+        return self.replica if self._usable else self.primary
+
+    async def read_async_engine(self):
+        if self.async_replica is None:
+            return self.async_primary
+        if self._claim_check():
+            try:
+                async with self.async_replica.connect() as conn:
+                    self._record(float((await conn.execute(LAG_SQL)).scalar()))
+            except Exception as e:
+                self._record(None, e)
+        return self.async_replica if self._usable else self.async_primary
+
+    def status(self) -> dict:
+        return {
+            "configured": self.replica is not None,
+            "routing_to": "replica" if (self.replica is not None and self._usable) else "primary",
+            "last_lag_seconds": self.last_lag,
+            "max_lag_seconds": self.max_lag,
+        }
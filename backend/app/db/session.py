@@ -1,19 +1,39 @@
 # backend/app/db/session.py
 import os
-import json
-import boto3
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, Union
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from app.core.logger import app_logger as logger
 from app.db.base import Base
-from app.db.model import Cafe
+from app.db.credentials import attach_credential_provider, get_credential_provider
+from app.db.pool import pool_options, instrument_pool
+from app.db.query_stats import instrument_queries
+from app.db.replica import ReplicaRouter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Read from env (local dev) or use hardcoded fallback if absolutely necessary
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Nothing in this module connects or calls AWS at import time. The database URL, the
+# engines and the replica router are all built on first use, so a cold start only pays
+# for what its first request actually touches. With DB_SECRET_ARN the URLs carry no
+# password: each new connection takes it from the credential provider (app/db/credentials.py),
+# which follows secret rotation without a restart.
+
+
+@lru_cache(maxsize=1)
+def database_urls() -> Tuple[Union[str, URL], Optional[Union[str, URL]]]:
+    """(primary URL, optional read replica URL), resolved once per process."""
+    # Read from env (local dev) or use hardcoded fallback if absolutely necessary
+    database_url = os.getenv("DATABASE_URL")
+    # Optional read replica for read-only endpoints (get_read_db / get_async_read_db)
+    replica_url = os.getenv("DATABASE_REPLICA_URL")
+    if database_url:
+        return database_url, replica_url
 
-if not DATABASE_URL:
     # If not in env, check if we are in Lambda/Production environment using AWS Secrets
     DB_HOST = os.getenv("DB_HOST")
     DB_PORT = os.getenv("DB_PORT", "5432")
@@ -21,34 +41,142 @@ if not DATABASE_URL:
     DB_USER = os.getenv("DB_USER")
     DB_SECRET_ARN = os.getenv("DB_SECRET_ARN")
 
-    if all([DB_HOST, DB_NAME, DB_USER, DB_SECRET_ARN]):
-        def get_db_password() -> str:
-            sm = boto3.client("secretsmanager")
-            resp = sm.get_secret_value(SecretId=DB_SECRET_ARN)
-            secret_str = resp.get("SecretString")
-            if not secret_str:
-                raise RuntimeError("SecretString empty for DB secret")
-            data = json.loads(secret_str)
-            return data["password"]
-
-        DB_PASSWORD = get_db_password()
-        DATABASE_URL = (
-            f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        )
-    else:
+    if not all([DB_HOST, DB_NAME, DB_USER, DB_SECRET_ARN]):
         # If no configuration is found, and we're not in a dev environment with a DATABASE_URL, raise error
         raise RuntimeError(
             "Database configuration not found. Set DATABASE_URL or DB_HOST/DB_NAME/DB_USER/DB_SECRET_ARN."
         )
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
+    database_url = URL.create(
+        "postgresql+psycopg2", username=DB_USER, host=DB_HOST, port=int(DB_PORT), database=DB_NAME
+    )
+
+    # Read replica shares the primary's credentials
+    DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+    if DB_REPLICA_HOST and not replica_url:
+        replica_url = database_url.set(host=DB_REPLICA_HOST)
+    return database_url, replica_url
+
+
+_lock = threading.Lock()
+_engines: Dict[str, object] = {}
+
+
+def _with_credentials(engine):
+    provider = get_credential_provider()
+    if provider is not None:
+        attach_credential_provider(engine.sync_engine if hasattr(engine, "sync_engine") else engine, provider)
+    return engine
+
+
+def _lazy(name: str, factory: Callable[[], object]):
+    if name not in _engines:
+        with _lock:
+            if name not in _engines:
+                _engines[name] = factory()
+    return _engines[name]
+
+
+# Pool sizing/mode comes from DB_POOL_* env vars (see app/db/pool.py); idle-time
+# validation replaces pool_pre_ping so busy connections skip the extra round trip
+def _create_engine():
+    engine = create_engine(database_urls()[0], **pool_options())
+    instrument_pool(engine)
+    instrument_queries(engine)
+    return _with_credentials(engine)
+
+
+# Async engine for non-blocking handlers; same database, asyncpg driver
+def _create_async_engine():
+    url = make_url(database_urls()[0]).set(drivername="postgresql+asyncpg")
+    engine = create_async_engine(url, **pool_options(is_async=True))
+    instrument_pool(engine.sync_engine)
+    instrument_queries(engine.sync_engine)
+    return _with_credentials(engine)
+
+
+# A replica that stops answering must not hold up the requests routed to it (or the lag
+# probe): connects and statements on it give up after these limits
+REPLICA_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT_SECONDS", "3"))
+REPLICA_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_REPLICA_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+# Replica sessions are read-only at the server too, so a stray write fails loudly
+def _create_replica_engine():
+    replica_url = database_urls()[1]
+    if not replica_url:
+        return None
+    engine = create_engine(
+        replica_url,
+        execution_options={"postgresql_readonly": True},
+        connect_args={
+            "connect_timeout": REPLICA_CONNECT_TIMEOUT_SECONDS,
+            "options": f"-c statement_timeout={REPLICA_STATEMENT_TIMEOUT_MS}",
+        },
+        **pool_options(),
+    )
+    instrument_pool(engine)
+    instrument_queries(engine)
+    return _with_credentials(engine)
+
+
+def _create_async_replica_engine():
+    replica_url = database_urls()[1]
+    if not replica_url:
+        return None
+    engine = create_async_engine(
+        make_url(replica_url).set(drivername="postgresql+asyncpg"),
+        execution_options={"postgresql_readonly": True},
+        connect_args={
+            "timeout": REPLICA_CONNECT_TIMEOUT_SECONDS,
+            "server_settings": {"statement_timeout": str(REPLICA_STATEMENT_TIMEOUT_MS)},
+        },
+        **pool_options(is_async=True),
+    )
+    instrument_pool(engine.sync_engine)
+    instrument_queries(engine.sync_engine)
+    return _with_credentials(engine)
+
+
+def get_engine():
+    return _lazy("sync", _create_engine)
+
+
+def get_async_engine():
+    return _lazy("async", _create_async_engine)
+
+
+def get_replica_engine():
+    """The sync replica engine, or None when no replica is configured."""
+    return _lazy("replica", _create_replica_engine)
+
+
+def get_async_replica_engine():
+    return _lazy("async_replica", _create_async_replica_engine)
+
+
+def get_replica_router() -> ReplicaRouter:
+    return _lazy("router", lambda: ReplicaRouter(
+        primary=get_engine(),
+        replica=get_replica_engine(),
+        async_primary=get_async_engine(),
+        async_replica=get_async_replica_engine(),
+    ))
+
+
+# Unbound; sessions are bound to an engine when they are opened (see app/db/deps.py)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
 
-# create tables if they don't exist
-print("Ensuring tables exist...")
-# Base.metadata.drop_all(bind=engine)  # DANGEROUS: Removed to prevent data loss
-Base.metadata.create_all(bind=engine)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def create_schema() -> None:
+    """
+    Create missing tables. Never runs at import: the migration job calls it, and so does
+    app startup in eager mode (see app/core/startup.py).
+    """
+    import app.db.model  # noqa: F401 - registers every table on Base.metadata
 
+    # create tables if they don't exist
+    logger.info("Ensuring tables exist...")
+    # Base.metadata.drop_all(bind=engine)  # DANGEROUS: Removed to prevent data loss
+    Base.metadata.create_all(bind=get_engine())
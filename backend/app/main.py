@@ -1,34 +1,43 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
-from app.api.cafes import cafes_router
-from app.api.users import router as users_router
-from app.api.liveUpdate import liveUpdates_router
-from app.api.checkins import router as checkins_router
-from app.api.reviews import router as reviews_router
-from app.api.occupancy import router as occupancy_router
-from app.api.reservations import router as reservations_router
-from app.api.upload import router as upload_router
-
-
-
-from app.db.base import Base
-from app.db.session import engine
+from app.core.startup import STARTUP_MODE, include_routers
+from app.db.session import create_schema, get_engine, get_async_engine, get_replica_engine, get_replica_router
+from app.db.pool import pool_stats
+from app.core.cache import cache_stats
+from app.core.http_cache import HTTPCacheMiddleware
 from contextlib import asynccontextmanager
 
+# prefix -> (module, router attribute); in cold_start mode each module is imported on first use
+ROUTERS = {
+    "/cafes": ("app.api.cafes", "cafes_router"),
+    "/users": ("app.api.users", "router"),
+    "/liveUpdates": ("app.api.liveUpdate", "liveUpdates_router"),
+    "/checkins": ("app.api.checkins", "router"),
+    "/reviews": ("app.api.reviews", "router"),
+    "/occupancy": ("app.api.occupancy", "router"),
+    "/reservations": ("app.api.reservations", "router"),
+    "/upload": ("app.api.upload", "router"),
+    "/batch": ("app.api.batch", "router"),
+}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Retrieve/Create tables
-    Base.metadata.create_all(bind=engine)
+    # Retrieve/Create tables; in cold_start mode the migration job owns the schema
+    if STARTUP_MODE == "eager":
+        create_schema()
     yield
 
-from app.core.logger import LoggingMiddleware
+from app.core.metrics import RequestMetricsMiddleware, METRICS_EXPORT, metrics
+from app.db.query_stats import QueryStatsMiddleware
+from app.core.profiling import ProfilingMiddleware
 
 app = FastAPI(lifespan=lifespan)
 
-# Add Logging Middleware
-app.add_middleware(LoggingMiddleware)
+# Cache-Control / ETag / Last-Modified from each endpoint's @cache_policy
+app.add_middleware(HTTPCacheMiddleware)
 
 # Mount static files to serve uploads locally
 static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
@@ -54,14 +63,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(cafes_router)
-app.include_router(users_router)
-app.include_router(liveUpdates_router)
-app.include_router(checkins_router)
-app.include_router(reviews_router)
-app.include_router(occupancy_router)
-app.include_router(reservations_router)
-app.include_router(upload_router)
+include_routers(app, ROUTERS)
+
+# Per-request query count, DB time, N+1 detection and query budgets
+app.add_middleware(QueryStatsMiddleware)
+
+# Sampled / on-demand / slow-request profiles (PROFILE_* env vars)
+app.add_middleware(ProfilingMiddleware)
+
+# Request id, access log line and per-route metrics. Added last so it is outermost and
+# times everything above, including lazy router loading.
+app.add_middleware(RequestMetricsMiddleware)
 
 
 
@@ -69,3 +81,29 @@ app.include_router(upload_router)
 def read_root():
     return {"hello": "world"}
 
+
+# GET /health/db-pool - connection pool state, checkout wait, overflow and connection age
+@app.get("/health/db-pool")
+def read_db_pool():
+    replica_engine = get_replica_engine()
+    return {
+        "sync": pool_stats(get_engine()),
+        "async": pool_stats(get_async_engine().sync_engine),
+        "replica": {
+            **get_replica_router().status(),
+            "pool": pool_stats(replica_engine) if replica_engine is not None else None,
+        },
+    }
+
+
+# GET /health/cache - hit/miss/stale counters and lookup/load latency per cache
+@app.get("/health/cache")
+def read_cache_stats():
+    return cache_stats()
+
+
+# GET /metrics - per-route latency/size histograms, status counts and in-flight requests (Prometheus)
+if METRICS_EXPORT in ("prometheus", "both"):
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
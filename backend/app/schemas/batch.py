@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+import os
+
+# Keeps one batch well inside the Lambda timeout
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10"))
+
+class BatchItem(BaseModel):
+    method: str = "GET"
+    path: str = Field(..., examples=["/reviews/cafe/5b7e0c1e-8a43-4c0e-9d0e-3c5a0f8f4b11?limit=20"])
+    # e.g. If-None-Match from an earlier response, to get a bodiless 304 back
+    headers: Dict[str, str] = Field(default_factory=dict)
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchResult(BaseModel):
+    status: int
+    headers: Dict[str, str] = Field(default_factory=dict)
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    # Same order as the requests
+    responses: List[BatchResult]
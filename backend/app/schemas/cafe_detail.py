@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from app.schemas.cafes import CafePublic
+from app.schemas.liveUpdate import LiveUpdatePublic
+from app.schemas.reviews import ReviewPublic
+from app.schemas.checkins import CheckinStatus
+
+# Sections of GET /cafes/{cafe_id}/full, selectable with ?fields=
+CAFE_FULL_SECTIONS = ("cafe", "stories", "reviews", "occupancy", "checkin")
+
+class OccupancyPoint(BaseModel):
+    at: datetime  # start of the bucket
+    occupancy_level: int
+
+class CafeFull(BaseModel):
+    # Newest change across the returned sections
+    updated_at: Optional[datetime] = None
+    cafe: Optional[CafePublic] = None
+    stories: Optional[List[LiveUpdatePublic]] = None
+    reviews: Optional[List[ReviewPublic]] = None
+    occupancy: Optional[List[OccupancyPoint]] = None
+    # Only with ?user_sub=
+    checkin: Optional[CheckinStatus] = None
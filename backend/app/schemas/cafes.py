@@ -1,6 +1,7 @@
 # backend/app/schemas/cafes.py
 from pydantic import BaseModel, HttpUrl, Field
 from uuid import UUID
+from datetime import datetime
 from typing import Optional, List, Dict, Union, Any, Optional
 import re
 
@@ -65,9 +66,19 @@ class CafeBase(BaseModel):
 class CafeCreate(CafeBase):
     pass
 
+class ImageVariants(BaseModel):
+    thumb_url: Optional[str] = None
+    card_url: Optional[str] = None
+    full_url: Optional[str] = None
+    placeholder: Optional[str] = None  # tiny inline data URI
+
+    class Config:
+        from_attributes = True
+
 class StoryInfo(BaseModel):
     id: UUID
     image_url: str
+    variants: Optional[ImageVariants] = None
     vibe: Optional[str] = None
     visit_purpose: Optional[str] = None
     created_at: Any # Using Any to handle datetime/string conversion easily
@@ -77,8 +88,12 @@ class CafePublic(CafeBase):
     avg_rating: Optional[float] = None
     occupancy_level: Optional[int] = 0
     onboarding_completed: bool = False
+    # Drives Last-Modified / conditional GET
+    updated_at: Optional[datetime] = None
     has_active_stories: bool = False
     active_stories: List[StoryInfo] = Field(default_factory=list)
+    # Keyed by the original photo URL (cover, cafe and menu photos)
+    image_variants: Dict[str, ImageVariants] = Field(default_factory=dict)
 
     class Config:
         from_attributes = True
@@ -1,7 +1,8 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
+from app.schemas.cafes import ImageVariants
 
 
 # Base model for live updates
@@ -31,9 +32,15 @@ class LiveUpdatePublic(BaseModel):
     visit_purpose: Optional[str] = None
     created_at: datetime
     expires_at: datetime
+    variants: Optional[ImageVariants] = None
 
     class Config:
         from_attributes = True
 
 class LiveUpdateUserResponse(LiveUpdatePublic):
-    cafe_name: str
\ No newline at end of file
+    cafe_name: str
+
+class StoryFeedPage(BaseModel):
+    items: List[LiveUpdateUserResponse] = []
+    # Opaque; pass back as ?cursor= to fetch the next (older) page. None on the last page.
+    next_cursor: Optional[str] = None
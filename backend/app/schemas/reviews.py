@@ -15,6 +15,7 @@ class ReviewCreate(ReviewBase):
 class ReviewPublic(ReviewBase):
     id: UUID
     created_at: datetime
+    updated_at: Optional[datetime] = None
     username: Optional[str] = None # For display
 
     class Config:
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, EmailStr, Field
 from uuid import UUID
 from typing import Optional, List, Dict, Any
+from app.schemas.liveUpdate import LiveUpdateUserResponse
+from app.schemas.reservations import ReservationPublic
 
 class UserBase(BaseModel):
     # We might not receive username immediately, but email is certain
@@ -32,6 +34,18 @@ class SavedCafe(BaseModel):
     class Config:
         from_attributes = True
 
+class SavedCafeStatus(SavedCafe):
+    cover_photo: Optional[str] = None
+    occupancy_level: Optional[int] = 0
+
+class SavedCafesSync(BaseModel):
+    # Diff recorded by the client since its last sync; ids in both lists are treated as removed
+    add: List[UUID] = []
+    remove: List[UUID] = []
+
+class SavedCafesSyncResult(BaseModel):
+    saved_cafe_ids: List[UUID] = []
+
 class UserPublic(UserBase):
     id: UUID
     cognito_sub: str
@@ -42,3 +56,13 @@ class UserPublic(UserBase):
     saved_cafes: List[SavedCafe] = []
     class Config:
         from_attributes = True
+
+
+class UserProfileBundle(UserPublic):
+    saved_cafes: List[SavedCafeStatus] = []
+
+class ProfileBundle(BaseModel):
+    user: UserProfileBundle
+    active_stories: List[LiveUpdateUserResponse] = []
+    upcoming_reservations: List[ReservationPublic] = []
+    today_checkins: List[UUID] = []
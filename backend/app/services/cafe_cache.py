@@ -0,0 +1,95 @@
+# backend/app/services/cafe_cache.py
+"""
+Read-through cache for cafe detail (GET /cafes/{id}) and owner -> cafe lookups
+(GET /cafes/owner/{sub}). Entries hold the serialized CafePublic, never ORM objects, so
+they work on the shared (Redis) backend too.
+
+Writes that change what those endpoints return call invalidate_cafe() after commit:
+update_cafe, delete_cafe, update_occupancy and review creation (avg_rating). With the
+memory backend the TTL bounds staleness for changes made on other instances; with the
+shared backend invalidation is global and the TTL only covers image variants generated later.
+
+Loaders open their own sessions: a stale entry is refreshed after the response is sent,
+when the request's session is already closed.
+"""
+import os
+from typing import Optional
+from app.core.cache import Cache
+from app.db import queries
+from app.db.session import SessionLocal, AsyncSessionLocal, get_engine, get_async_engine
+from app.schemas.cafes import CafePublic
+from app.services.images import attach_cafe_variants, attach_cafe_variants_async
+
+CAFE_CACHE_TTL_SECONDS = float(os.getenv("CAFE_CACHE_TTL_SECONDS", "30"))
+# After the TTL: serve the old entry while one request refreshes it...
+CAFE_CACHE_STALE_SECONDS = float(os.getenv("CAFE_CACHE_STALE_SECONDS", "30"))
+# ...and keep serving it if the database is unreachable
+CAFE_CACHE_STALE_IF_ERROR_SECONDS = float(os.getenv("CAFE_CACHE_STALE_IF_ERROR_SECONDS", "600"))
+
+_details = Cache("cafe", CAFE_CACHE_TTL_SECONDS, CAFE_CACHE_STALE_SECONDS, CAFE_CACHE_STALE_IF_ERROR_SECONDS)
+# owner sub -> cafe id; the detail itself lives in _details
+_owners = Cache("cafe-owner", CAFE_CACHE_TTL_SECONDS, CAFE_CACHE_STALE_SECONDS, CAFE_CACHE_STALE_IF_ERROR_SECONDS)
+
+
+def _serialize(cafe) -> dict:
+    return CafePublic.model_validate(cafe).model_dump(mode="json")
+
+
+def _load_detail(cafe_id) -> Optional[dict]:
+    # Primary: the owner dashboard reads its cafe right after creating or editing it
+    db = SessionLocal(bind=get_engine())
+    try:
+        cafe = db.execute(queries.cafe_by_id(cafe_id)).scalars().first()
+        if cafe is None:
+            return None
+        attach_cafe_variants(db, [cafe])
+        return _serialize(cafe)
+    finally:
+        db.close()
+
+
+async def _aload_detail(cafe_id) -> Optional[dict]:
+    # Primary too: a miss usually follows invalidate_cafe() after a write, and a lagging
+    # replica would hand back (and cache) the row from before that write
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        cafe = (await db.execute(queries.cafe_by_id(cafe_id))).scalars().first()
+        if cafe is None:
+            return None
+        await attach_cafe_variants_async(db, [cafe])
+        return _serialize(cafe)
+
+
+def _load_owner_cafe_id(cognito_sub: str) -> Optional[str]:
+    db = SessionLocal(bind=get_engine())
+    try:
+        cafe = db.execute(queries.cafe_by_owner(cognito_sub)).scalars().first()
+        return str(cafe.id) if cafe is not None else None
+    finally:
+        db.close()
+
+
+async def get_detail(cafe_id) -> Optional[dict]:
+    """The cafe's CafePublic payload, or None if it does not exist."""
+    return await _details.aget_or_load(str(cafe_id), lambda: _aload_detail(cafe_id))
+
+
+def get_owner_detail(cognito_sub: str) -> Optional[dict]:
+    """The owner's cafe payload, or None if they have none."""
+    cafe_id = _owners.get_or_load(cognito_sub, lambda: _load_owner_cafe_id(cognito_sub))
+    if cafe_id is None:
+        return None
+    return _details.get_or_load(cafe_id, lambda: _load_detail(cafe_id))
+
+
+def store_detail(cafe) -> dict:
+    """Serialize a cafe (variants already attached) and cache it; returns the payload."""
+    payload = _serialize(cafe)
+    _details.set(payload["id"], payload)
+    return payload
+
+
+def invalidate_cafe(cafe_id, *owner_subs: Optional[str]) -> None:
+    _details.delete(str(cafe_id))
+    subs = [sub for sub in owner_subs if sub]
+    if subs:
+        _owners.delete(*subs)
@@ -0,0 +1,80 @@
+import base64
+from typing import Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.db.model import ContentHash
+
+# Content-addressed storage: identical bytes in the same category map to one canonical
+# object, so client retries and re-uploads of the same photo never write a second copy.
+
+
+def content_key(category: str, sha256_hex: str, ext: str) -> str:
+    """Canonical key for a blob: {category}/{sha256}.{ext}"""
+    return f"{category}/{sha256_hex}.{ext}"
+
+
+def sha256_b64(sha256_hex: str) -> str:
+    """S3 checksum headers carry the digest base64-encoded."""
+    return base64.b64encode(bytes.fromhex(sha256_hex)).decode('ascii')
+
+
+def lookup(db: Session, category: str, sha256_hex: str) -> Optional[str]:
+    row = db.query(ContentHash.url).filter(
+        ContentHash.sha256 == sha256_hex,
+        ContentHash.category == category
+    ).first()
+    return row[0] if row else None
+
+
+def lookup_many(db: Session, category_hashes: Iterable[tuple]) -> Dict[tuple, str]:
+    """Resolve many (category, sha256) pairs in one query."""
+    pairs = set(category_hashes)
+    if not pairs:
+        return {}
+    rows = db.query(ContentHash.category, ContentHash.sha256, ContentHash.url).filter(
+        ContentHash.sha256.in_({h for _, h in pairs})
+    ).all()
+    return {(c, h): url for c, h, url in rows if (c, h) in pairs}
+
+
+def record(db: Session, category: str, sha256_hex: str, url: str, size: Optional[int] = None,
+           content_type: Optional[str] = None) -> str:
+    """
+    Register url as the canonical copy of the blob and return the canonical url.
+    If another upload won the race the existing entry is kept and returned.
+    """
+    db.execute(
+        pg_insert(ContentHash).values(
+            sha256=sha256_hex, category=category, url=url, size=size, content_type=content_type
+        ).on_conflict_do_nothing()
+    )
+    db.commit()
+    return lookup(db, category, sha256_hex) or url
+
+
+async def lookup_async(db: AsyncSession, category: str, sha256_hex: str) -> Optional[str]:
+    """lookup for async sessions."""
+    return (await db.execute(
+        select(ContentHash.url).where(ContentHash.sha256 == sha256_hex, ContentHash.category == category)
+    )).scalar()
+
+
+async def record_async(db: AsyncSession, category: str, sha256_hex: str, url: str, size: Optional[int] = None,
+                       content_type: Optional[str] = None) -> str:
+    """record for async sessions."""
+    await db.execute(
+        pg_insert(ContentHash).values(
+            sha256=sha256_hex, category=category, url=url, size=size, content_type=content_type
+        ).on_conflict_do_nothing()
+    )
+    await db.commit()
+    return await lookup_async(db, category, sha256_hex) or url
+
+
+def forget_urls(db: Session, urls: Iterable[str]) -> None:
+    """Drop index entries for objects that have been deleted (caller commits)."""
+    urls = set(urls)
+    if urls:
+        db.query(ContentHash).filter(ContentHash.url.in_(urls)).delete(synchronize_session=False)
@@ -0,0 +1,186 @@
+import asyncio
+import base64
+import io
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Union
+from PIL import Image, ImageOps
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.db.model import ImageVariant
+from app.services.upload import upload_bytes, key_from_url
+from app.core.logger import app_logger as logger
+
+# Longest side in pixels for each stored variant
+VARIANT_SIZES = {"thumb": 160, "card": 640, "full": 1600}
+PLACEHOLDER_SIZE = 16
+
+VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "WEBP").upper()  # WEBP or JPEG
+VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "80"))
+
+_FORMAT_INFO = {
+    "WEBP": ("webp", "image/webp"),
+    "JPEG": ("jpg", "image/jpeg"),
+}
+
+_executor: Optional[Executor] = None
+
+
+def _get_executor() -> Executor:
+    """
+    Lazily created worker pool for decoding/resizing.
+    Lambda has no /dev/shm, so multiprocessing pools cannot start there; fall back to threads
+    (Pillow releases the GIL while resampling and encoding).
+    """
+    global _executor
+    if _executor is None:
+        mode = os.getenv("IMAGE_PIPELINE_EXECUTOR") or ("thread" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "process")
+        workers = int(os.getenv("IMAGE_PIPELINE_WORKERS", str(min(4, os.cpu_count() or 1))))
+        if mode == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-pipeline")
+    return _executor
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.convert("RGB").save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buf, "WEBP", quality=quality, method=4)
+    return buf.getvalue()
+
+
+def render_variants(source: Union[bytes, str], fmt: str = VARIANT_FORMAT, quality: int = VARIANT_QUALITY) -> dict:
+    """
+    Decode an upload once and produce the resized variants plus an inline placeholder.
+    `source` is the raw bytes or a local file path (cheaper to hand to a worker process).
+    CPU-bound; runs inside the worker pool, so it must stay a picklable top-level function.
+    """
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+        # Let the JPEG decoder downscale by 1/2..1/8 while decoding; much cheaper for phone photos
+        largest = max(VARIANT_SIZES.values())
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+
+        variants = {}
+        # Largest first so each smaller variant resamples from an already reduced image
+        current = img
+        for name, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+            variants[name] = _encode(current, fmt, quality)
+
+        tiny = current.copy()
+        tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+        tiny_bytes = _encode(tiny, fmt, 30)
+
+    mime = _FORMAT_INFO[fmt][1]
+    placeholder = f"data:{mime};base64,{base64.b64encode(tiny_bytes).decode('ascii')}"
+    return {"variants": variants, "placeholder": placeholder}
+
+
+def variant_key(original_key: str, name: str, fmt: str = VARIANT_FORMAT) -> str:
+    """Variants live next to the original: photos/abc.jpg -> photos/abc_thumb.webp"""
+    stem = original_key.rsplit(".", 1)[0]
+    return f"{stem}_{name}.{_FORMAT_INFO[fmt][0]}"
+
+
+async def generate_and_store_variants(db: AsyncSession, original_url: str, source: Union[bytes, str]) -> Optional[ImageVariant]:
+    """
+    Render variants off the event loop, upload them concurrently and record them.
+    Failures are logged and swallowed: clients fall back to the original image.
+    """
+    existing = await db.get(ImageVariant, original_url)
+    if existing:
+        # Deduplicated upload: the canonical object already has its variants
+        return existing
+
+    key = key_from_url(original_url)
+    if not key:
+        logger.warning(f"Skipping variants for image outside the bucket: {original_url}")
+        return None
+
+    try:
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(_get_executor(), render_variants, source, VARIANT_FORMAT, VARIANT_QUALITY)
+
+        mime = _FORMAT_INFO[VARIANT_FORMAT][1]
+        names = list(rendered["variants"].keys())
+        urls = await asyncio.gather(*[
+            run_in_threadpool(upload_bytes, variant_key(key, name), rendered["variants"][name], mime)
+            for name in names
+        ])
+        url_by_name = dict(zip(names, urls))
+
+        record = ImageVariant(
+            original_url=original_url,
+            thumb_url=url_by_name.get("thumb"),
+            card_url=url_by_name.get("card"),
+            full_url=url_by_name.get("full"),
+            placeholder=rendered["placeholder"],
+        )
+        record = await db.merge(record)
+        await db.commit()
+        return record
+    except Exception as e:
+        await db.rollback()
+        logger.warning(f"Image variant generation failed for {original_url}: {str(e)}")
+        return None
+
+
+def load_variants(db: Session, urls: Iterable[str]) -> Dict[str, ImageVariant]:
+    """Fetch variants for many original URLs in one query."""
+    urls = {u for u in urls if u}
+    if not urls:
+        return {}
+    rows = db.query(ImageVariant).filter(ImageVariant.original_url.in_(urls)).all()
+    return {row.original_url: row for row in rows}
+
+
+async def load_variants_async(db: AsyncSession, urls: Iterable[str]) -> Dict[str, ImageVariant]:
+    """load_variants for async sessions."""
+    urls = {u for u in urls if u}
+    if not urls:
+        return {}
+    rows = (await db.execute(select(ImageVariant).where(ImageVariant.original_url.in_(urls)))).scalars().all()
+    return {row.original_url: row for row in rows}
+
+
+def _cafe_image_urls(cafes) -> set:
+    urls = set()
+    for cafe in cafes:
+        urls.add(cafe.cover_photo)
+        urls.update(cafe.cafe_photos or [])
+        urls.update(cafe.menu_photos or [])
+        for story in getattr(cafe, 'active_stories', None) or []:
+            urls.add(story["image_url"])
+    return urls
+
+
+def _apply_cafe_variants(cafes, variants: Dict[str, ImageVariant]) -> None:
+    for cafe in cafes:
+        cafe_urls = [cafe.cover_photo, *(cafe.cafe_photos or []), *(cafe.menu_photos or [])]
+        setattr(cafe, 'image_variants', {u: variants[u] for u in cafe_urls if u in variants})
+        for story in getattr(cafe, 'active_stories', None) or []:
+            story["variants"] = variants.get(story["image_url"])
+
+
+def attach_cafe_variants(db: Session, cafes) -> None:
+    """
+    Set `image_variants` (original URL -> variants) on each cafe and `variants` on each
+    story dict already attached as `active_stories`. One query for the whole list.
+    """
+    cafes = [c for c in cafes if c is not None]
+    _apply_cafe_variants(cafes, load_variants(db, _cafe_image_urls(cafes)))
+
+
+async def attach_cafe_variants_async(db: AsyncSession, cafes) -> None:
+    """attach_cafe_variants for async sessions."""
+    cafes = [c for c in cafes if c is not None]
+    _apply_cafe_variants(cafes, await load_variants_async(db, _cafe_image_urls(cafes)))
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Callable
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from app.db.model import LiveUpdates, ImageVariant
+from app.services.upload import key_from_url
+from app.services import content_store
+from app.core.logger import app_logger as logger
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+S3_DELETE_BATCH = 1000
+
+# Only objects written for stories are removed; anything else a story points at is left alone
+STORY_KEY_PREFIXES = ("liveupdates/", "live_update/")
+
+
+def story_key_from_url(image_url: str, bucket: str) -> Optional[str]:
+    """
+    Map a stored story image URL back to its S3 key.
+    Returns None for URLs outside our bucket or outside the story prefixes.
+    """
+    key = key_from_url(image_url, bucket)
+    return key if key and key.startswith(STORY_KEY_PREFIXES) else None
+
+
+def delete_s3_keys(s3_client, bucket: str, keys: Iterable[str]) -> set:
+    """
+    Delete keys in DeleteObjects batches of 1000.
+    Returns the set of keys that failed so their rows can be retried on the next run.
+    Deleting a key that no longer exists is not an error, which keeps reruns idempotent.
+    """
+    keys = list(dict.fromkeys(keys))
+    failed = set()
+    for i in range(0, len(keys), S3_DELETE_BATCH):
+        chunk = keys[i:i + S3_DELETE_BATCH]
+        resp = s3_client.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True}
+        )
+        for err in resp.get("Errors", []):
+            logger.warning(f"Failed to delete s3://{bucket}/{err.get('Key')}: {err.get('Code')}")
+            failed.add(err.get("Key"))
+    return failed
+
+
+def sweep_expired_stories(
+    db: Session,
+    s3_client,
+    bucket: str,
+    batch_size: int = 500,
+    now: Optional[datetime] = None,
+    should_continue: Callable[[], bool] = lambda: True
+) -> dict:
+    """
+    Delete expired live updates and their images in bounded batches.
+
+    Each batch is committed on its own, so an interrupted run simply resumes on the
+    next invocation. Rows are locked with SKIP LOCKED so overlapping runs never fight
+    over the same batch. Images (and their resized variants) are removed before their
+    rows; a row whose objects could not all be deleted is kept for the next run.
+    """
+    if not bucket:
+        # Without a bucket no image keys can be resolved; deleting the rows would orphan
+        # their objects for good
+        raise ValueError("Story sweep needs a bucket; CAFE_PHOTOS_BUCKET is missing")
+
+    now = now or datetime.now(timezone.utc)
+    stats = {"stories_deleted": 0, "objects_deleted": 0, "objects_failed": 0, "batches": 0}
+
+    while should_continue():
+        rows = db.execute(
+            select(LiveUpdates.id, LiveUpdates.image_url)
+            .where(LiveUpdates.expires_at <= now)
+            .order_by(LiveUpdates.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            break
+
+        story_urls = {story_id: image_url for story_id, image_url in rows}
+        # Uploads are content-addressed, so one object can back several stories;
+        # objects still referenced by a story outside this batch must survive
+        shared_urls = {
+            url for (url,) in db.query(LiveUpdates.image_url).filter(
+                LiveUpdates.image_url.in_(set(story_urls.values())),
+                LiveUpdates.id.notin_(list(story_urls))
+            ).distinct()
+        }
+        variant_rows = db.query(ImageVariant).filter(
+            ImageVariant.original_url.in_(set(story_urls.values()))
+        ).all()
+        variants_by_url = {v.original_url: v for v in variant_rows}
+
+        # Every object a story owns: the original plus its resized variants
+        keys_by_id = {}
+        for story_id, image_url in story_urls.items():
+            if image_url in shared_urls:
+                continue
+            variant = variants_by_url.get(image_url)
+            urls = [image_url]
+            if variant:
+                urls += [variant.thumb_url, variant.card_url, variant.full_url]
+            keys_by_id[story_id] = [k for k in (story_key_from_url(u, bucket) for u in urls if u) if k]
+
+        all_keys = {k for keys in keys_by_id.values() for k in keys}
+        failed = delete_s3_keys(s3_client, bucket, all_keys) if all_keys else set()
+        deletable: List = [
+            story_id for story_id in story_urls
+            if not failed.intersection(keys_by_id.get(story_id, []))
+        ]
+
+        if deletable:
+            deleted_urls = {story_urls[story_id] for story_id in deletable} - shared_urls
+            db.execute(delete(LiveUpdates).where(LiveUpdates.id.in_(deletable)))
+            db.execute(delete(ImageVariant).where(ImageVariant.original_url.in_(deleted_urls)))
+            content_store.forget_urls(db, deleted_urls)
+        db.commit()
+
+        stats["batches"] += 1
+        stats["stories_deleted"] += len(deletable)
+        stats["objects_deleted"] += len(all_keys - failed)
+        stats["objects_failed"] += len(failed)
+
+        if len(rows) < batch_size or not deletable:
+            # Last page, or every row in this batch is stuck on S3 errors; stop rather than spin
+            break
+
+    return stats
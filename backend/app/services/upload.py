@@ -1,15 +1,67 @@
-import boto3
 import uuid
-from typing import Literal
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Literal, Optional, Tuple
+from urllib.parse import urlparse, unquote
 import os
 from dotenv import load_dotenv
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.services import content_store
+from app.core.logger import app_logger as logger
 
 load_dotenv()
 
 # S3 configuration
-s3 = boto3.client('s3')
 bucket_name = os.getenv('CAFE_PHOTOS_BUCKET')
 
+
+@lru_cache(maxsize=1)
+def get_s3():
+    """S3 client, created on first use so cold starts that never upload skip boto3 entirely."""
+    import boto3
+    return boto3.client('s3')
+
+def public_url(key: str) -> str:
+    """Public URL for an object in the photos bucket."""
+    # Use AWS_REGION env var if available (Lambda), else default to us-east-1
+    region = os.environ.get('AWS_REGION', 'us-east-1')
+    return f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
+
+
+def key_from_url(url: str, bucket: Optional[str] = None) -> Optional[str]:
+    """
+    Map a public URL back to its S3 key, or None if it does not point into the bucket.
+    Handles both virtual-hosted and path-style (local S3 stand-in) URLs.
+    """
+    bucket = bucket or bucket_name
+    if not bucket:
+        return None
+    parsed = urlparse(url or "")
+    path = unquote(parsed.path).lstrip("/")
+    if parsed.netloc.startswith(f"{bucket}."):
+        return path or None
+    if path.startswith(f"{bucket}/"):
+        return path[len(bucket) + 1:] or None
+    return None
+
+
+def upload_bytes(key: str, content: bytes, content_type: str) -> str:
+    """Blocking put of a single object; returns its public URL."""
+    if not bucket_name:
+        raise RuntimeError("S3 bucket not configured. CAFE_PHOTOS_BUCKET is missing.")
+    get_s3().put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=content,
+        ContentType=content_type
+    )
+    return public_url(key)
+
+
 def save_to_s3(file_content: bytes, filename: str, category: str) -> str:
     """
     Upload file to S3 and return the public URL. 
@@ -38,21 +90,170 @@ def save_to_s3(file_content: bytes, filename: str, category: str) -> str:
     
     # Upload to S3
     try:
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=key,
-            Body=file_content,
-            ContentType=content_type
-        )
-        
-        # Return public URL
-        # Return public URL
-        # Use AWS_REGION env var if available (Lambda), else default to us-east-1
-        region = os.environ.get('AWS_REGION', 'us-east-1')
-        
-        url = f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
-        return url
+        return upload_bytes(key, file_content, content_type)
     except Exception as e:
-        print(f"Error uploading to S3: {e}")
+        logger.error(f"Error uploading to S3: {e}")
         raise e
 
+
+
+
+# --------------------------- STREAMING UPLOADS ---------------------------
+# Parts are read from the request one at a time, so memory stays at about two parts
+# however large the photo is. S3 requires every part except the last to be >= 5 MiB.
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(25 * 1024 * 1024)))
+
+# (magic bytes offset, magic bytes, extension, content type)
+_IMAGE_SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (0, b'GIF87a', 'gif', 'image/gif'),
+    (0, b'GIF89a', 'gif', 'image/gif'),
+    (8, b'WEBP', 'webp', 'image/webp'),
+    (4, b'ftypheic', 'heic', 'image/heic'),
+    (4, b'ftypheix', 'heic', 'image/heic'),
+    (4, b'ftypmif1', 'heic', 'image/heic'),
+]
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UnsupportedMediaType(Exception):
+    pass
+
+
+@dataclass
+class StreamedUpload:
+    url: str
+    key: str
+    size: int
+    content_type: str
+    # Local copy of the bytes when requested (for the image pipeline); caller removes it
+    local_path: Optional[str] = None
+    sha256: Optional[str] = None
+    # True when identical bytes were already stored and the existing URL was returned
+    deduplicated: bool = False
+
+
+def sniff_image_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """Detect the image type from its first bytes; returns (extension, content type)."""
+    for offset, magic, ext, content_type in _IMAGE_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return ext, content_type
+    return None
+
+
+async def stream_to_s3(
+    file: UploadFile,
+    category: str,
+    keep_local_copy: bool = False,
+    db: Optional[AsyncSession] = None
+) -> StreamedUpload:
+    """
+    Stream an upload into S3 without holding it in memory.
+
+    The type is sniffed from the first chunk (the client-sent filename/content type is not
+    trusted) and the size cap is enforced while reading. Small files are a single PUT; larger
+    ones use a multipart upload whose parts are sent from the threadpool so the event loop
+    keeps serving other requests. A failed multipart upload is aborted.
+
+    With a db session the upload is content-addressed: single-part files already in the
+    hash index skip the PUT entirely, and a multipart upload that turns out to be a
+    duplicate is deleted again in favour of the existing copy.
+    """
+    if not bucket_name:
+        raise RuntimeError("S3 bucket not configured. CAFE_PHOTOS_BUCKET is missing.")
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    chunk = await file.read(MULTIPART_PART_SIZE)
+    sniffed = sniff_image_type(chunk[:16])
+    if not sniffed:
+        raise UnsupportedMediaType("Unsupported image type")
+    ext, content_type = sniffed
+
+    key = f"{category}/{uuid.uuid4()}.{ext}"
+    local = tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) if keep_local_copy else None
+    hasher = hashlib.sha256()
+    size = 0
+    upload_id = None
+    url = None
+    deduplicated = False
+
+    try:
+        next_chunk = await file.read(MULTIPART_PART_SIZE) if chunk else b''
+        if not next_chunk:
+            # Fits in one part: a plain PUT is one request instead of three
+            size = len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadTooLarge(f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+            if local:
+                local.write(chunk)
+            hasher.update(chunk)
+
+            if db is not None:
+                url = await content_store.lookup_async(db, category, hasher.hexdigest())
+                deduplicated = url is not None
+                key = content_store.content_key(category, hasher.hexdigest(), ext)
+            if not deduplicated:
+                url = await run_in_threadpool(upload_bytes, key, chunk, content_type)
+        else:
+            mpu = await run_in_threadpool(
+                get_s3().create_multipart_upload, Bucket=bucket_name, Key=key, ContentType=content_type
+            )
+            upload_id = mpu['UploadId']
+            parts = []
+            part_number = 1
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge(f"File exceeds {MAX_UPLOAD_BYTES} bytes")
+                if local:
+                    local.write(chunk)
+                hasher.update(chunk)
+                resp = await run_in_threadpool(
+                    get_s3().upload_part, Bucket=bucket_name, Key=key, UploadId=upload_id,
+                    PartNumber=part_number, Body=chunk
+                )
+                parts.append({'ETag': resp['ETag'], 'PartNumber': part_number})
+                part_number += 1
+                chunk, next_chunk = next_chunk, (await file.read(MULTIPART_PART_SIZE) if next_chunk else b'')
+
+            await run_in_threadpool(
+                get_s3().complete_multipart_upload, Bucket=bucket_name, Key=key, UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            upload_id = None
+            url = public_url(key)
+
+            if db is not None:
+                existing = await content_store.lookup_async(db, category, hasher.hexdigest())
+                if existing and existing != url:
+                    await run_in_threadpool(get_s3().delete_object, Bucket=bucket_name, Key=key)
+                    url, deduplicated = existing, True
+    except Exception:
+        if upload_id:
+            await run_in_threadpool(get_s3().abort_multipart_upload, Bucket=bucket_name, Key=key, UploadId=upload_id)
+        if local:
+            local.close()
+            os.unlink(local.name)
+        raise
+
+    if local:
+        local.close()
+
+    if db is not None and not deduplicated:
+        url = await content_store.record_async(db, category, hasher.hexdigest(), url, size, content_type)
+
+    return StreamedUpload(
+        url=url,
+        key=key_from_url(url) or key,
+        size=size,
+        content_type=content_type,
+        local_path=local.name if local else None,
+        sha256=hasher.hexdigest(),
+        deduplicated=deduplicated
+    )
@@ -0,0 +1,73 @@
+"""
+Per-request SQL construction/compilation overhead for the hot lookups, before and after
+the cached statements in app/db/queries.py.
+
+Runs without a database: it reproduces what Connection.execute does before talking to
+the server (build the statement, derive its cache key, fetch/compile the SQL for the
+PostgreSQL dialect), using the same kind of compiled cache the engine keeps.
+
+    cd backend && python -m benchmarks.statement_cache [iterations]
+"""
+import sys
+import timeit
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+from app.db import queries
+from app.db.model import Cafe, User, LiveUpdates, Checkin
+
+DIALECT = postgresql.psycopg2.dialect()
+
+
+def _execute_prep(stmt, cache: dict):
+    """Cache-key generation + compiled-cache lookup, as the engine does per execute."""
+    key = stmt._generate_cache_key()
+    compiled = cache.get(key.key) if key is not None else None
+    if compiled is None:
+        compiled = DIALECT.statement_compiler(DIALECT, stmt, cache_key=key)
+        if key is not None:
+            cache[key.key] = compiled
+    # Bind the current parameter values, as execution does
+    compiled.construct_params(extracted_parameters=key.bindparams if key is not None else None)
+    return compiled
+
+
+def main(iterations: int = 20000):
+    cafe_id, user_sub = uuid.uuid4(), "sub-123"
+    now = datetime.now(timezone.utc)
+
+    cases = {
+        "cafe by id": (
+            lambda: Query(Cafe).filter(Cafe.id == cafe_id).statement,
+            lambda: queries.cafe_by_id(cafe_id),
+        ),
+        "user by cognito_sub": (
+            lambda: Query(User).filter(User.cognito_sub == user_sub).statement,
+            lambda: queries.user_by_sub(user_sub),
+        ),
+        "active stories for cafe": (
+            lambda: Query(LiveUpdates).filter(
+                LiveUpdates.cafe_id == cafe_id, LiveUpdates.expires_at > now
+            ).order_by(LiveUpdates.created_at.desc()).statement,
+            lambda: queries.active_stories_for_cafe(cafe_id, now),
+        ),
+        "today's check-in": (
+            lambda: Query(Checkin).filter(
+                Checkin.user_sub == user_sub, Checkin.cafe_id == cafe_id, Checkin.created_at >= now
+            ).order_by(Checkin.created_at.desc()).limit(1).statement,
+            lambda: queries.latest_checkin_since(user_sub, cafe_id, now),
+        ),
+    }
+
+    print(f"{'query':<26}{'no cache':>12}{'rebuilt':>12}{'cached':>12}   (microseconds per request)")
+    for name, (legacy, cached) in cases.items():
+        rebuilt_cache, lambda_cache = {}, {}
+        no_cache = timeit.timeit(lambda: legacy().compile(dialect=DIALECT), number=iterations // 10) / (iterations // 10)
+        rebuilt = timeit.timeit(lambda: _execute_prep(legacy(), rebuilt_cache), number=iterations) / iterations
+        after = timeit.timeit(lambda: _execute_prep(cached(), lambda_cache), number=iterations) / iterations
+        print(f"{name:<26}{no_cache * 1e6:>12.1f}{rebuilt * 1e6:>12.1f}{after * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
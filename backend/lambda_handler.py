@@ -1,16 +1,22 @@
 # backend/lambda_handler.py
 import json
 from mangum import Mangum
+from app.db.credentials import prefetch_credentials
+
+# Fetch the DB secret in the background while the app is imported below
+prefetch_credentials()
+
 from app.main import app
+from app.core.logger import app_logger as logger, flush_logs
 
 asgi_handler = Mangum(app, lifespan="off")
 
 def handler(event, context):
-    # Debug print – shows up in CloudWatch logs
-    print(f"PATH: {event.get('path')}, METHOD: {event.get('httpMethod')}")
+    logger.debug(f"Lambda event: {event.get('httpMethod')} {event.get('path')}")
     try:
         return asgi_handler(event, context)
     except RuntimeError as e:
+        logger.exception(f"Mangum error: {str(e)}")
         # TEMP: surface Mangum error and event back to client for debugging
         return {
             "statusCode": 500,
@@ -20,6 +26,9 @@ def handler(event, context):
                 "event_keys": list(event.keys())
             }),
         }
+    finally:
+        # Records are written by a background thread; drain it before the instance freezes
+        flush_logs()
 
 
 
@@ -1,7 +1,10 @@
 import os
 import json
-import boto3
 import psycopg2
+from app.db.credentials import get_credential_provider, SecretsCredentialProvider
+from app.db.session import create_schema
+from app.db.migrate import run_migrations
+from app.core.logger import app_logger as logger, flush_logs
 
 def handler(event, context):
     try:
@@ -17,60 +20,36 @@ def handler(event, context):
                 "body": json.dumps({"error": "Missing DB configuration env vars"})
             }
 
-        # Fetch password from Secrets Manager
-        sm = boto3.client("secretsmanager")
-        resp = sm.get_secret_value(SecretId=DB_SECRET_ARN)
-        secret_str = resp.get("SecretString")
-        if not secret_str:
-            raise RuntimeError("SecretString empty for DB secret")
-        
-        secret_data = json.loads(secret_str)
-        password = secret_data["password"]
+        # Same cached, rotation-aware provider the API uses; create_schema() below reuses it
+        provider = get_credential_provider() or SecretsCredentialProvider(DB_SECRET_ARN)
 
-        # Connect to DB
-        conn = psycopg2.connect(
+        # Connect to DB (refetching the secret once if it was rotated)
+        conn = provider.call_with_retry(lambda credentials: psycopg2.connect(
             host=DB_HOST,
             port=DB_PORT,
             database=DB_NAME,
-            user=DB_USER,
-            password=password
-        )
-        conn.autocommit = True
-        cur = conn.cursor()
+            user=credentials.username or DB_USER,
+            password=credentials.password
+        ))
+        logger.info(f"Connected to {DB_NAME} at {DB_HOST}")
 
-        print(f"Connected to {DB_NAME} at {DB_HOST}")
+        # The API no longer creates tables on cold start; new tables are created here
+        create_schema()
 
-        # SQL Migration: Add cancellation_reason column to reservations table
-        sql1 = "ALTER TABLE reservations ADD COLUMN IF NOT EXISTS cancellation_reason TEXT;"
-        print(f"Executing: {sql1}")
-        cur.execute(sql1)
-        print("Successfully added cancellation_reason column to reservations table.")
-
-        # SQL Migration: Migrate liveUpdates table (user_id -> user_sub)
-        # Check if user_id exists before renaming
-        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='liveUpdates' AND column_name='user_id';")
-        if cur.fetchone():
-            sql2 = 'ALTER TABLE "liveUpdates" RENAME COLUMN user_id TO user_sub;'
-            print(f"Executing: {sql2}")
-            cur.execute(sql2)
-            
-            sql3 = 'ALTER TABLE "liveUpdates" ALTER COLUMN user_sub TYPE TEXT USING user_sub::text;'
-            print(f"Executing: {sql3}")
-            cur.execute(sql3)
-            print("Successfully migrated liveUpdates table.")
-        else:
-            print("liveUpdates table already migrated or user_id column missing.")
-
-        cur.close()
+        # Versioned changes to existing tables (app/db/migrations), each applied once
+        applied = run_migrations(conn)
         conn.close()
 
         return {
             "statusCode": 200,
-            "body": json.dumps({"message": "Migration completed successfully"})
+            "body": json.dumps({"message": "Migration completed successfully", "applied": applied})
         }
     except Exception as e:
-        print(f"Migration error: {str(e)}")
+        logger.exception(f"Migration error: {str(e)}")
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
         }
+    finally:
+        # Log records are written by a background thread; drain it before the instance freezes
+        flush_logs()
@@ -0,0 +1,46 @@
+import os
+import json
+import boto3
+from app.db.session import SessionLocal, get_engine
+from app.services.story_sweeper import sweep_expired_stories
+from app.core.logger import app_logger as logger, flush_logs
+
+# Stop starting new batches once less than this much Lambda time is left
+SAFETY_MARGIN_MS = 10_000
+
+def handler(event, context):
+    """
+    Scheduled job: removes expired live updates and their S3 images.
+    Safe to run repeatedly; an interrupted run is picked up by the next one.
+    """
+    event = event or {}
+    batch_size = int(event.get("batch_size", os.getenv("SWEEPER_BATCH_SIZE", "500")))
+    bucket = os.getenv("CAFE_PHOTOS_BUCKET")
+
+    # S3_ENDPOINT_URL lets the job run against a local S3 stand-in (e.g. MinIO)
+    s3_client = boto3.client("s3", endpoint_url=os.getenv("S3_ENDPOINT_URL"))
+
+    def should_continue() -> bool:
+        if context is None or not hasattr(context, "get_remaining_time_in_millis"):
+            return True
+        return context.get_remaining_time_in_millis() > SAFETY_MARGIN_MS
+
+    db = SessionLocal(bind=get_engine())
+    try:
+        stats = sweep_expired_stories(db, s3_client, bucket, batch_size=batch_size, should_continue=should_continue)
+        logger.info(f"Story sweep finished: {stats}")
+        return {
+            "statusCode": 200,
+            "body": json.dumps(stats)
+        }
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Story sweep error: {str(e)}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": str(e)})
+        }
+    finally:
+        db.close()
+        # Log records are written by a background thread; drain it before the instance freezes
+        flush_logs()
@@ -0,0 +1,160 @@
+"""
+Story sweeper against SQLite and an in-memory S3 stand-in.
+
+Run from backend/: python -m pytest tests
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.db.model import ContentHash, ImageVariant, LiveUpdates
+from app.services.story_sweeper import sweep_expired_stories
+
+BUCKET = "nook-photos"
+NOW = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+
+def url(key: str) -> str:
+    return f"https://{BUCKET}.s3.amazonaws.com/{key}"
+
+
+class FakeS3:
+    """Just enough of the boto3 client for delete_objects; `failing` keys come back as Errors."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.deleted = set()
+
+    def delete_objects(self, Bucket, Delete):
+        assert Bucket == BUCKET
+        errors = []
+        for obj in Delete["Objects"]:
+            if obj["Key"] in self.failing:
+                errors.append({"Key": obj["Key"], "Code": "AccessDenied"})
+            else:
+                self.deleted.add(obj["Key"])
+        return {"Errors": errors} if errors else {}
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    # Plain copies of the tables the sweeper touches: no Postgres-only server defaults and
+    # no foreign keys to tables that are not created here
+    metadata = MetaData()
+    for table in (LiveUpdates.__table__, ImageVariant.__table__, ContentHash.__table__):
+        Table(table.name, metadata, *(Column(c.name, c.type, primary_key=c.primary_key) for c in table.columns))
+    metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def add_story(db, key: str, expired: bool = True, variants: bool = False) -> uuid.UUID:
+    story_id = uuid.uuid4()
+    image_url = url(key)
+    db.add(LiveUpdates(
+        id=story_id, cafe_id=uuid.uuid4(), user_sub="user", image_url=image_url,
+        created_at=NOW - timedelta(days=2),
+        expires_at=NOW - timedelta(hours=1) if expired else NOW + timedelta(hours=1),
+    ))
+    if variants and not db.get(ImageVariant, image_url):
+        stem = key.rsplit(".", 1)[0]
+        db.add(ImageVariant(
+            original_url=image_url, thumb_url=url(f"{stem}_thumb.webp"),
+            card_url=url(f"{stem}_card.webp"), full_url=url(f"{stem}_full.webp"), created_at=NOW,
+        ))
+        db.add(ContentHash(sha256=uuid.uuid4().hex * 2, category="liveupdates", url=image_url, created_at=NOW))
+    db.commit()
+    return story_id
+
+
+def story_ids(db):
+    return set(db.scalars(select(LiveUpdates.id)))
+
+
+def count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_missing_bucket_deletes_nothing(db):
+    add_story(db, "liveupdates/a.jpg", variants=True)
+
+    with pytest.raises(ValueError):
+        sweep_expired_stories(db, FakeS3(), None, now=NOW)
+
+    assert len(story_ids(db)) == 1
+    assert count(db, ImageVariant) == 1
+    assert count(db, ContentHash) == 1
+
+
+def test_deletes_expired_stories_and_their_variants(db):
+    expired = add_story(db, "liveupdates/a.jpg", variants=True)
+    live = add_story(db, "liveupdates/b.jpg", expired=False)
+    s3 = FakeS3()
+
+    stats = sweep_expired_stories(db, s3, BUCKET, now=NOW)
+
+    assert story_ids(db) == {live}
+    assert expired not in story_ids(db)
+    assert s3.deleted == {
+        "liveupdates/a.jpg", "liveupdates/a_thumb.webp", "liveupdates/a_card.webp", "liveupdates/a_full.webp",
+    }
+    assert count(db, ImageVariant) == 0
+    assert count(db, ContentHash) == 0
+    assert stats["stories_deleted"] == 1
+    assert stats["objects_deleted"] == 4
+
+
+def test_partial_delete_failure_keeps_only_the_failed_rows(db):
+    ok = add_story(db, "liveupdates/ok.jpg", variants=True)
+    stuck = add_story(db, "liveupdates/stuck.jpg", variants=True)
+    # One variant of the second story cannot be deleted
+    s3 = FakeS3(failing={"liveupdates/stuck_card.webp"})
+
+    stats = sweep_expired_stories(db, s3, BUCKET, now=NOW)
+
+    assert story_ids(db) == {stuck}
+    assert ok not in story_ids(db)
+    # The stuck story keeps its variant and hash rows so the next run can retry its keys
+    assert db.get(ImageVariant, url("liveupdates/stuck.jpg")) is not None
+    assert db.get(ImageVariant, url("liveupdates/ok.jpg")) is None
+    assert count(db, ContentHash) == 1
+    assert stats["objects_failed"] == 1
+    assert stats["stories_deleted"] == 1
+
+    # Once S3 recovers, the retry removes the rest
+    s3.failing.clear()
+    sweep_expired_stories(db, s3, BUCKET, now=NOW)
+    assert story_ids(db) == set()
+    assert "liveupdates/stuck_card.webp" in s3.deleted
+
+
+def test_shared_object_survives_while_a_live_story_uses_it(db):
+    # Content-addressed uploads: the same bytes back both stories
+    expired = add_story(db, "liveupdates/same.jpg", variants=True)
+    live = add_story(db, "liveupdates/same.jpg", expired=False)
+    s3 = FakeS3()
+
+    stats = sweep_expired_stories(db, s3, BUCKET, now=NOW)
+
+    assert story_ids(db) == {live}
+    assert expired not in story_ids(db)
+    assert s3.deleted == set()
+    assert db.get(ImageVariant, url("liveupdates/same.jpg")) is not None
+    assert count(db, ContentHash) == 1
+    assert stats["stories_deleted"] == 1
+    assert stats["objects_deleted"] == 0
+
+
+def test_objects_outside_the_story_prefixes_are_left_alone(db):
+    add_story(db, "cafes/cover.jpg")
+    s3 = FakeS3()
+
+    sweep_expired_stories(db, s3, BUCKET, now=NOW)
+
+    assert story_ids(db) == set()
+    assert s3.deleted == set()
@@ -10,6 +10,8 @@ from aws_cdk import (
     aws_cognito as cognito,
     aws_cloudfront as cloudfront,
     aws_cloudfront_origins as origins,
+    aws_events as events,
+    aws_events_targets as targets,
     RemovalPolicy,
     CfnOutput
     # aws_sqs as sqs,
@@ -116,7 +118,8 @@ class InfraStack(Stack):
             index="migration_handler.py",
             handler="handler",
             vpc=vpc,
-            timeout=Duration.seconds(60),
+            # CREATE INDEX CONCURRENTLY and batched backfills can take a while on large tables
+            timeout=Duration.minutes(15),
             memory_size=512
         )
 
@@ -173,6 +176,40 @@ class InfraStack(Stack):
         cafe_photos_bucket.grant_read(cafe_lambda)
 
         cafe_lambda.add_environment("CAFE_PHOTOS_BUCKET", cafe_photos_bucket.bucket_name)
+        # Lets the API sign upload URLs without looking up the bucket region
+        cafe_lambda.add_environment("CAFE_PHOTOS_BUCKET_REGION", self.region)
+
+        # Expired-story sweeper, runs on a schedule
+        sweeper_lambda = PythonFunction(
+            self, "nook-sweeper-lambda",
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            entry=os.path.join(os.path.dirname(__file__), "../../backend"),
+            index="sweeper_handler.py",
+            handler="handler",
+            vpc=vpc,
+            timeout=Duration.minutes(5),
+            memory_size=512
+        )
+
+        db_instance.connections.allow_default_port_from(sweeper_lambda, "Sweeper Lambda access to DB")
+
+        sweeper_lambda.add_environment("DB_HOST", db_instance.instance_endpoint.hostname)
+        sweeper_lambda.add_environment("DB_NAME", db_name)
+        sweeper_lambda.add_environment("DB_USER", db_username)
+        sweeper_lambda.add_environment("DB_PORT", str(db_instance.instance_endpoint.port))
+        sweeper_lambda.add_environment("CAFE_PHOTOS_BUCKET", cafe_photos_bucket.bucket_name)
+
+        if db_instance.secret is not None:
+            sweeper_lambda.add_environment("DB_SECRET_ARN", db_instance.secret.secret_arn)
+            db_instance.secret.grant_read(sweeper_lambda)
+
+        cafe_photos_bucket.grant_delete(sweeper_lambda)
+
+        events.Rule(
+            self, "nook-sweeper-schedule",
+            schedule=events.Schedule.rate(Duration.hours(1)),
+            targets=[targets.LambdaFunction(sweeper_lambda)]
+        )
 
         # Admin Frontend Static Website Hosting
         admin_bucket = s3.Bucket(
@@ -194,8 +231,33 @@ class InfraStack(Stack):
             )
         )
 
+        # Edge cache in front of the API. TTLs come from each route's Cache-Control
+        # (s-maxage); default_ttl=0 keeps responses without one (no-store, private) uncached,
+        # so only the public routes are answered here without invoking the Lambda.
+        api_cache_policy = cloudfront.CachePolicy(
+            self, "nook-api-cache-policy",
+            min_ttl=Duration.seconds(0),
+            default_ttl=Duration.seconds(0),
+            max_ttl=Duration.days(1),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.all(),
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+        )
+        api_distribution = cloudfront.Distribution(
+            self, "nook-api-dist",
+            default_behavior=cloudfront.BehaviorOptions(
+                origin=origins.RestApiOrigin(api),
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_ALL,
+                cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD,
+                cache_policy=api_cache_policy,
+                origin_request_policy=cloudfront.OriginRequestPolicy.ALL_VIEWER_EXCEPT_HOST_HEADER,
+            )
+        )
+
         # Outputs
         CfnOutput(self, "nook-api-url", value=api.url)
+        CfnOutput(self, "nook-api-edge-url", value=f"https://{api_distribution.distribution_domain_name}")
         CfnOutput(self, "nook-admin-url", value=f"https://{distribution.distribution_domain_name}")
         CfnOutput(self, "nook-user-pool-id", value=user_pool.user_pool_id)
         CfnOutput(self, "nook-user-pool-client-id", value=user_pool_client.user_pool_client_id)